@@ -9,15 +9,44 @@ class Settings:
     def __init__(self):
         # Database settings
         self.DATABASE_URL = os.environ.get('DATABASE_URL')
+        self.DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+        self.DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '20'))
+        self.DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # Seconds
+
+        # Thread pool for blocking calls made from async request handlers
+        self.BLOCKING_POOL_SIZE = int(os.environ.get('BLOCKING_POOL_SIZE', '32'))
 
         # JWT settings
         self.SECRET_KEY = os.environ.get('SECRET_KEY')
         self.ALGORITHM = os.environ.get('ALGORITHM', 'HS256')
         self.ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', '30'))
+        self.USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '1000'))
+        self.USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '30'))  # Seconds; bounds staleness in other processes
+
+        # Password hashing and login throttling
+        self.BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))  # Cost factor; weaker existing hashes are upgraded at login
+        self.PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.LOGIN_ATTEMPT_WINDOW = int(os.environ.get('LOGIN_ATTEMPT_WINDOW', '300'))  # Seconds
+        self.LOGIN_MAX_ATTEMPTS_PER_ACCOUNT = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_ACCOUNT', '5'))  # Failed logins per window
+        self.LOGIN_MAX_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_IP', '50'))  # Failed logins per window
 
         # File upload settings
         self.UPLOAD_DIR = os.environ.get('UPLOAD_DIR', 'uploads')
         self.MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE', '10485760'))  # Default 10MB
+        self.UPLOAD_PART_SIZE = int(os.environ.get('UPLOAD_PART_SIZE', '8388608'))  # Suggested part size for chunked uploads
+        self.UPLOAD_TEMP_DIR = os.environ.get('UPLOAD_TEMP_DIR', os.path.join(self.UPLOAD_DIR, '.partial'))
+        self.UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', '86400'))  # Seconds before an idle chunked upload is discarded
+        self.PUBLIC_UPLOADS_MOUNT = os.environ.get('PUBLIC_UPLOADS_MOUNT', 'false').lower() == 'true'  # Unauthenticated /uploads static mount, legacy clients only
+        self.FILE_SERVING_OFFLOAD = os.environ.get('FILE_SERVING_OFFLOAD', '')  # '', 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd)
+        self.FILE_SERVING_ACCEL_PREFIX = os.environ.get('FILE_SERVING_ACCEL_PREFIX', '/protected-uploads/')  # Internal nginx location for UPLOAD_DIR
+
+        # Citation page previews
+        self.PAGE_RENDER_WORKERS = int(os.environ.get('PAGE_RENDER_WORKERS', '2'))  # Processes rendering PDF pages
+        self.PAGE_RENDER_DEFAULT_DPI = int(os.environ.get('PAGE_RENDER_DEFAULT_DPI', '110'))
+        self.PAGE_RENDER_MAX_DPI = int(os.environ.get('PAGE_RENDER_MAX_DPI', '200'))
+        self.PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', os.path.join(self.UPLOAD_DIR, '.pages'))
+        self.PAGE_CACHE_MEMORY_BYTES = int(os.environ.get('PAGE_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+        self.PAGE_CACHE_DISK_BYTES = int(os.environ.get('PAGE_CACHE_DISK_BYTES', str(1024 * 1024 * 1024)))
 
         # Gemini API settings
         self.GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
@@ -25,6 +54,56 @@ class Settings:
         # Vector Store settings
         self.VECTOR_STORE_COLLECTION = os.environ.get('VECTOR_STORE_COLLECTION', 'HR')
         self.VECTOR_DISTANCE_STRATEGY = os.environ.get('VECTOR_DISTANCE_STRATEGY', 'cosine')
+        self.EMBEDDING_DIMENSION = int(os.environ.get('EMBEDDING_DIMENSION', '768'))
+        self.RETRIEVAL_SOURCE = os.environ.get('RETRIEVAL_SOURCE', 'collection')  # 'collection' (PGVector) or 'chunks' (document_chunks)
+        self.RETRIEVAL_MODE = os.environ.get('RETRIEVAL_MODE', 'vector')  # 'vector' or 'hybrid' (vector + full-text, fused)
+        self.RETRIEVAL_K = int(os.environ.get('RETRIEVAL_K', '3'))
+        self.RETRIEVAL_FANOUT = int(os.environ.get('RETRIEVAL_FANOUT', '20'))  # Candidates per source before fusion
+        self.RRF_K = int(os.environ.get('RRF_K', '60'))
+        self.FULL_TEXT_SEARCH_CONFIG = os.environ.get('FULL_TEXT_SEARCH_CONFIG', 'english')
+        self.RETRIEVAL_SHARE_ADMIN_DOCUMENTS = os.environ.get('RETRIEVAL_SHARE_ADMIN_DOCUMENTS', 'true').lower() == 'true'
+
+        # Query embedding cache settings
+        self.QUERY_EMBEDDING_CACHE_URL = os.environ.get('QUERY_EMBEDDING_CACHE_URL', '')  # e.g. redis://localhost:6379/0; shared tier for query embeddings
+        self.QUERY_EMBEDDING_CACHE_TTL = int(os.environ.get('QUERY_EMBEDDING_CACHE_TTL', '86400'))  # Seconds, shared backend only
+
+        # Answer cache settings
+        self.ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+        self.ANSWER_CACHE_SIZE = int(os.environ.get('ANSWER_CACHE_SIZE', '500'))  # Entries per collection
+        self.ANSWER_CACHE_TTL = int(os.environ.get('ANSWER_CACHE_TTL', '3600'))  # Seconds
+        self.ANSWER_CACHE_SIMILARITY = float(os.environ.get('ANSWER_CACHE_SIMILARITY', '0.95'))  # Cosine similarity for near-duplicate hits
+        self.ANSWER_CACHE_VERSION_TTL = float(os.environ.get('ANSWER_CACHE_VERSION_TTL', '5'))  # Seconds between collection version checks
+
+        # Vector index settings for document_chunks.embedding
+        self.VECTOR_INDEX_METHOD = os.environ.get('VECTOR_INDEX_METHOD', 'hnsw')  # 'hnsw' or 'ivfflat'
+        self.HNSW_M = int(os.environ.get('HNSW_M', '16'))
+        self.HNSW_EF_CONSTRUCTION = int(os.environ.get('HNSW_EF_CONSTRUCTION', '64'))
+        self.HNSW_EF_SEARCH = int(os.environ.get('HNSW_EF_SEARCH', '40'))
+        self.IVFFLAT_LISTS = int(os.environ.get('IVFFLAT_LISTS', '0'))  # 0 = derive from row count
+        self.IVFFLAT_PROBES = int(os.environ.get('IVFFLAT_PROBES', '10'))
+        self.VECTOR_ITERATIVE_SCAN = os.environ.get('VECTOR_ITERATIVE_SCAN', 'off')  # pgvector >= 0.8: 'relaxed_order' or 'strict_order'
+
+        # Embedding batch settings
+        self.EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', '64'))
+        self.EMBEDDING_MIN_BATCH_SIZE = int(os.environ.get('EMBEDDING_MIN_BATCH_SIZE', '4'))
+        self.EMBEDDING_MAX_CONCURRENCY = int(os.environ.get('EMBEDDING_MAX_CONCURRENCY', '4'))
+        self.EMBEDDING_MAX_RETRIES = int(os.environ.get('EMBEDDING_MAX_RETRIES', '5'))
+
+        # Embedding cache settings
+        self.EMBEDDING_CACHE_ENABLED = os.environ.get('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+        self.EMBEDDING_CACHE_PERSISTENT = os.environ.get('EMBEDDING_CACHE_PERSISTENT', 'true').lower() == 'true'
+        self.EMBEDDING_CACHE_SIZE = int(os.environ.get('EMBEDDING_CACHE_SIZE', '10000'))
+
+        # Ingestion worker settings
+        self.INGESTION_POLL_INTERVAL = float(os.environ.get('INGESTION_POLL_INTERVAL', '2'))
+        self.INGESTION_JOB_TIMEOUT = int(os.environ.get('INGESTION_JOB_TIMEOUT', '900'))  # Seconds without progress before a job is reclaimed
+        self.INGESTION_MAX_ATTEMPTS = int(os.environ.get('INGESTION_MAX_ATTEMPTS', '3'))
+        self.CHUNK_WRITER = os.environ.get('CHUNK_WRITER', 'copy')  # 'copy' (binary COPY) or 'insert'
+        self.CHUNK_COPY_FLUSH_SIZE = int(os.environ.get('CHUNK_COPY_FLUSH_SIZE', '5000'))  # Chunks buffered per COPY
+        self.INGESTION_CHUNK_WINDOW = int(os.environ.get('INGESTION_CHUNK_WINDOW', '256'))  # Chunks embedded and stored per step
+        self.COMPACTION_BATCH_SIZE = int(os.environ.get('COMPACTION_BATCH_SIZE', '1000'))  # Chunks purged per transaction
+        self.COMPACTION_INTERVAL = int(os.environ.get('COMPACTION_INTERVAL', '600'))  # Seconds between compactions by idle workers, 0 = never
+        self.BULK_IMPORT_WORKERS = int(os.environ.get('BULK_IMPORT_WORKERS', str(os.cpu_count() or 1)))
 
         # Validate required settings
         self._validate_settings()
@@ -44,14 +123,75 @@ class Settings:
         """Return settings as a dictionary"""
         return {
             'DATABASE_URL': self.DATABASE_URL,
+            'DB_POOL_SIZE': self.DB_POOL_SIZE,
+            'DB_MAX_OVERFLOW': self.DB_MAX_OVERFLOW,
+            'DB_POOL_RECYCLE': self.DB_POOL_RECYCLE,
+            'BLOCKING_POOL_SIZE': self.BLOCKING_POOL_SIZE,
             'SECRET_KEY': self.SECRET_KEY,
             'ALGORITHM': self.ALGORITHM,
             'ACCESS_TOKEN_EXPIRE_MINUTES': self.ACCESS_TOKEN_EXPIRE_MINUTES,
+            'USER_CACHE_SIZE': self.USER_CACHE_SIZE,
+            'USER_CACHE_TTL': self.USER_CACHE_TTL,
+            'BCRYPT_ROUNDS': self.BCRYPT_ROUNDS,
+            'PASSWORD_HASH_WORKERS': self.PASSWORD_HASH_WORKERS,
+            'LOGIN_ATTEMPT_WINDOW': self.LOGIN_ATTEMPT_WINDOW,
+            'LOGIN_MAX_ATTEMPTS_PER_ACCOUNT': self.LOGIN_MAX_ATTEMPTS_PER_ACCOUNT,
+            'LOGIN_MAX_ATTEMPTS_PER_IP': self.LOGIN_MAX_ATTEMPTS_PER_IP,
             'UPLOAD_DIR': self.UPLOAD_DIR,
             'MAX_FILE_SIZE': self.MAX_FILE_SIZE,
+            'UPLOAD_PART_SIZE': self.UPLOAD_PART_SIZE,
+            'UPLOAD_TEMP_DIR': self.UPLOAD_TEMP_DIR,
+            'UPLOAD_SESSION_TTL': self.UPLOAD_SESSION_TTL,
+            'PUBLIC_UPLOADS_MOUNT': self.PUBLIC_UPLOADS_MOUNT,
+            'FILE_SERVING_OFFLOAD': self.FILE_SERVING_OFFLOAD,
+            'FILE_SERVING_ACCEL_PREFIX': self.FILE_SERVING_ACCEL_PREFIX,
+            'PAGE_RENDER_WORKERS': self.PAGE_RENDER_WORKERS,
+            'PAGE_RENDER_DEFAULT_DPI': self.PAGE_RENDER_DEFAULT_DPI,
+            'PAGE_RENDER_MAX_DPI': self.PAGE_RENDER_MAX_DPI,
+            'PAGE_CACHE_DIR': self.PAGE_CACHE_DIR,
+            'PAGE_CACHE_MEMORY_BYTES': self.PAGE_CACHE_MEMORY_BYTES,
+            'PAGE_CACHE_DISK_BYTES': self.PAGE_CACHE_DISK_BYTES,
             'GEMINI_API_KEY': self.GEMINI_API_KEY,
             'VECTOR_STORE_COLLECTION': self.VECTOR_STORE_COLLECTION,
             'VECTOR_DISTANCE_STRATEGY': self.VECTOR_DISTANCE_STRATEGY,
+            'EMBEDDING_DIMENSION': self.EMBEDDING_DIMENSION,
+            'RETRIEVAL_SOURCE': self.RETRIEVAL_SOURCE,
+            'RETRIEVAL_MODE': self.RETRIEVAL_MODE,
+            'RETRIEVAL_K': self.RETRIEVAL_K,
+            'RETRIEVAL_FANOUT': self.RETRIEVAL_FANOUT,
+            'RRF_K': self.RRF_K,
+            'FULL_TEXT_SEARCH_CONFIG': self.FULL_TEXT_SEARCH_CONFIG,
+            'RETRIEVAL_SHARE_ADMIN_DOCUMENTS': self.RETRIEVAL_SHARE_ADMIN_DOCUMENTS,
+            'QUERY_EMBEDDING_CACHE_URL': self.QUERY_EMBEDDING_CACHE_URL,
+            'QUERY_EMBEDDING_CACHE_TTL': self.QUERY_EMBEDDING_CACHE_TTL,
+            'ANSWER_CACHE_ENABLED': self.ANSWER_CACHE_ENABLED,
+            'ANSWER_CACHE_SIZE': self.ANSWER_CACHE_SIZE,
+            'ANSWER_CACHE_TTL': self.ANSWER_CACHE_TTL,
+            'ANSWER_CACHE_SIMILARITY': self.ANSWER_CACHE_SIMILARITY,
+            'ANSWER_CACHE_VERSION_TTL': self.ANSWER_CACHE_VERSION_TTL,
+            'VECTOR_INDEX_METHOD': self.VECTOR_INDEX_METHOD,
+            'HNSW_M': self.HNSW_M,
+            'HNSW_EF_CONSTRUCTION': self.HNSW_EF_CONSTRUCTION,
+            'HNSW_EF_SEARCH': self.HNSW_EF_SEARCH,
+            'IVFFLAT_LISTS': self.IVFFLAT_LISTS,
+            'IVFFLAT_PROBES': self.IVFFLAT_PROBES,
+            'VECTOR_ITERATIVE_SCAN': self.VECTOR_ITERATIVE_SCAN,
+            'EMBEDDING_BATCH_SIZE': self.EMBEDDING_BATCH_SIZE,
+            'EMBEDDING_MIN_BATCH_SIZE': self.EMBEDDING_MIN_BATCH_SIZE,
+            'EMBEDDING_MAX_CONCURRENCY': self.EMBEDDING_MAX_CONCURRENCY,
+            'EMBEDDING_MAX_RETRIES': self.EMBEDDING_MAX_RETRIES,
+            'EMBEDDING_CACHE_ENABLED': self.EMBEDDING_CACHE_ENABLED,
+            'EMBEDDING_CACHE_PERSISTENT': self.EMBEDDING_CACHE_PERSISTENT,
+            'EMBEDDING_CACHE_SIZE': self.EMBEDDING_CACHE_SIZE,
+            'INGESTION_POLL_INTERVAL': self.INGESTION_POLL_INTERVAL,
+            'INGESTION_JOB_TIMEOUT': self.INGESTION_JOB_TIMEOUT,
+            'INGESTION_MAX_ATTEMPTS': self.INGESTION_MAX_ATTEMPTS,
+            'INGESTION_CHUNK_WINDOW': self.INGESTION_CHUNK_WINDOW,
+            'CHUNK_WRITER': self.CHUNK_WRITER,
+            'CHUNK_COPY_FLUSH_SIZE': self.CHUNK_COPY_FLUSH_SIZE,
+            'COMPACTION_BATCH_SIZE': self.COMPACTION_BATCH_SIZE,
+            'COMPACTION_INTERVAL': self.COMPACTION_INTERVAL,
+            'BULK_IMPORT_WORKERS': self.BULK_IMPORT_WORKERS,
         }
 
 # Create a global settings instance
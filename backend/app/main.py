@@ -4,9 +4,13 @@ from fastapi.staticfiles import StaticFiles
 
 from .routes import admin, auth, file_system, chat
 from .utils.database import engine, Base
+from .utils.schema_upgrade import upgrade_schema
+from .utils.vector_store import get_collection_retriever
+from .config import settings
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+upgrade_schema()
 
 app = FastAPI(
     title="Document Chat Bot API",
@@ -23,8 +27,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files directory for uploaded documents
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Unauthenticated static mount of the upload directory, kept only as an opt-in for
+# legacy clients: a stored path can back files of several users (deduplicated
+# uploads). Files are served with access checks by /api/files/files/{file_id}/content.
+if settings.PUBLIC_UPLOADS_MOUNT:
+    app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
 # Include routers with /api prefix
 app.include_router(auth.router, prefix="/api")
@@ -32,6 +39,13 @@ app.include_router(admin.router, prefix="/api")
 app.include_router(file_system.router, prefix="/api")
 app.include_router(chat.router, prefix="/api")  # Added chat router
 
+@app.on_event("startup")
+def warm_vector_store():
+    try:
+        get_collection_retriever(settings.VECTOR_STORE_COLLECTION).warm()
+    except Exception as e:
+        print(f"Error warming vector store: {str(e)}")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Document Chat Bot API"} 
\ No newline at end of file
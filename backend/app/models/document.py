@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Computed, Index
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import ARRAY, FLOAT
+from pgvector.sqlalchemy import Vector
 from .user import Base
+from ..config import settings
 
 class Document(Base):
     __tablename__ = "documents"
@@ -12,6 +14,8 @@ class Document(Base):
     file_path = Column(String)
     file_type = Column(String)
     uploaded_by = Column(Integer, ForeignKey("users.id"))
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=True, index=True)
+    collection = Column(String, index=True, default=settings.VECTOR_STORE_COLLECTION)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -20,11 +24,30 @@ class Document(Base):
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_document_chunks_chunk_tsv", "chunk_tsv", postgresql_using="gin"),
+        Index("ix_document_chunks_document_hash", "document_id", "content_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
     chunk_text = Column(Text)
     chunk_index = Column(Integer)
-    embedding = Column(ARRAY(FLOAT))  # Store vector embedding as array of floats
+    embedding = Column(Vector(settings.EMBEDDING_DIMENSION))  # pgvector column, indexed by utils/vector_index.py
+    chunk_metadata = Column(JSON)  # Loader metadata, e.g. source and page
+    content_hash = Column(String(64))  # sha256 of chunk_text, used to diff re-indexed files
+    # Full-text search vector, maintained by Postgres
+    chunk_tsv = deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{settings.FULL_TEXT_SEARCH_CONFIG}', coalesce(chunk_text, ''))", persisted=True)
+    ))
     
-    document = relationship("Document", back_populates="chunks") 
\ No newline at end of file
+    document = relationship("Document", back_populates="chunks")
+
+class CollectionVersion(Base):
+    """Bumped whenever the documents in a collection change; invalidates cached answers"""
+    __tablename__ = "collection_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import ARRAY, FLOAT
+from ..utils.database import Base
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        UniqueConstraint("provider", "model", "task_type", "content_hash", name="uq_embedding_cache_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    task_type = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # sha256 hex digest of the embedded text
+    embedding = Column(ARRAY(FLOAT), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -7,7 +7,7 @@ class Folder(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    parent_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("folders.id"), nullable=True, index=True)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -28,7 +28,8 @@ class File(Base):
     file_path = Column(String, nullable=False)
     file_type = Column(String)
     size = Column(Integer)  # Size in bytes
-    folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
+    content_hash = Column(String(64), index=True)  # sha256 hex digest, used to dedupe stored content
+    folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True, index=True)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..utils.database import Base
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+MODE_INGEST = "ingest"
+MODE_REINDEX = "reindex"  # Diff against the file's existing document
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default=JOB_PENDING, index=True)
+    mode = Column(String, nullable=False, default=MODE_INGEST, server_default=MODE_INGEST)
+    stage = Column(String, nullable=True)
+    progress = Column(Float, nullable=False, default=0.0)  # 0.0 - 1.0
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    worker_id = Column(String, nullable=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    file = relationship("File")
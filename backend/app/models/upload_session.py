@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy.sql import func
+from ..utils.database import Base
+
+UPLOAD_ACTIVE = "uploading"
+UPLOAD_COMPLETED = "completed"
+UPLOAD_ABORTED = "aborted"
+
+class UploadSession(Base):
+    """A chunked upload in progress; parts are appended to temp_path in order"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(36), primary_key=True)  # uuid4, handed to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
+    file_name = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)  # Declared total size in bytes
+    received_bytes = Column(BigInteger, nullable=False, default=0)
+    expected_sha256 = Column(String(64), nullable=True)  # Optional, checked on complete
+    temp_path = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=UPLOAD_ACTIVE)
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -7,9 +7,15 @@ import shutil
 from ..utils.database import get_db
 from ..models.user import User
 from ..models.document import Document
-from ..utils.security import get_current_user, get_password_hash
+from ..utils.security import get_current_user, aget_password_hash
 from ..config import settings
 from ..schemas.user import UserCreate, UserUpdate, UserResponse
+from ..utils.embedding_cache import embedding_cache
+from ..utils.database import pool_metrics
+from ..utils.vector_store import retriever_metrics
+from ..utils.answer_cache import answer_cache
+from ..utils.user_cache import user_cache
+from ..utils.page_preview import page_cache
 
 router = APIRouter(
     prefix="/admin",
@@ -66,7 +72,7 @@ async def create_user(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await aget_password_hash(user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email,
@@ -117,7 +123,7 @@ async def update_user(
     if user_data.email is not None:
         user.email = user_data.email
     if user_data.password is not None:
-        user.hashed_password = get_password_hash(user_data.password)
+        user.hashed_password = await aget_password_hash(user_data.password)
     if user_data.is_active is not None:
         user.is_active = user_data.is_active
     if user_data.is_admin is not None:
@@ -125,6 +131,7 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user_id)
     
     return user
 
@@ -150,5 +157,55 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    user_cache.invalidate(user_id)
     
     return {"message": "User deleted successfully"}
+
+# Metrics Endpoints
+@router.get("/metrics/embedding-cache")
+async def get_embedding_cache_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return embedding_cache.stats()
+
+@router.get("/metrics/vector-store")
+async def get_vector_store_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return {
+        "pool": pool_metrics(),
+        "retrievers": retriever_metrics()
+    }
+
+@router.get("/metrics/answer-cache")
+async def get_answer_cache_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return answer_cache.stats()
+
+@router.get("/metrics/user-cache")
+async def get_user_cache_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return user_cache.stats()
+
+@router.get("/metrics/page-cache")
+async def get_page_cache_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return page_cache.stats()
\ No newline at end of file
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -7,7 +7,8 @@ from pydantic import BaseModel, Field, constr
 
 from ..utils.database import get_db
 from ..models.user import User
-from ..utils.security import verify_password, get_password_hash, create_access_token, get_current_user
+from ..utils.security import averify_password, aget_password_hash, create_access_token, get_current_user
+from ..utils.login_throttle import login_throttle
 from ..config import settings
 from ..schemas.user import UserCreate, UserResponse
 
@@ -51,7 +52,7 @@ async def register_user(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await aget_password_hash(user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email,
@@ -68,9 +69,19 @@ async def register_user(
 
 @router.post("/token", response_model=TokenResponse)
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
+    address = request.client.host if request.client else None
+    retry_after = login_throttle.attempt(form_data.username, address)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
     # Check if user exists and is active
     user = db.query(User).filter(User.email == form_data.username).first()
     if not user:
@@ -89,17 +100,24 @@ async def login(
         )
     
     # Verify password
-    if not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = await averify_password(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_throttle.succeeded(form_data.username, address)
+    if new_hash:
+        # Stored hash was below BCRYPT_ROUNDS
+        user.hashed_password = new_hash
+        db.commit()
+
     # Generate access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id}, expires_delta=access_token_expires
     )
     
     return {
@@ -1,20 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 import google.generativeai as genai
-from langchain_community.vectorstores import PGVector
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader
+import base64
+import json
 import os
 
-from ..utils.database import get_db
+from ..utils.database import get_db, get_async_db, SessionLocal
+from ..utils.concurrency import run_blocking
 from ..utils.security import get_current_user
 from ..models.user import User
 from ..models.chat import Chat, ChatMessage
 from ..models.file_system import File as DBFile
+from ..models.document import DocumentChunk
+from ..utils.retrieval import asearch_document_chunks, asearch_full_text, reciprocal_rank_fusion
+from ..utils.retrieval_filter import RetrievalFilter
+from ..utils.vector_store import get_collection_retriever
+from ..utils.answer_cache import answer_cache, CachedAnswer
+from ..utils.document_processor import get_embedding_provider
 from ..config import settings
 
 router = APIRouter(
@@ -25,13 +35,9 @@ router = APIRouter(
 # Initialize Gemini
 genai.configure(api_key=settings.GEMINI_API_KEY)
 model = genai.GenerativeModel('gemini-1.5-pro')
-# Initialize embeddings
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    task_type="retrieval_document",
-    title="Document Embeddings",
-    google_api_key=settings.GEMINI_API_KEY
-)
+# Same provider as ingestion, so queries land in the same vector space. Its
+# embed_query goes through the embedding cache (memory, shared tier, Postgres).
+embeddings = get_embedding_provider()
 
 class NewChatResponse(BaseModel):
     id: str
@@ -39,6 +45,10 @@ class NewChatResponse(BaseModel):
 class MessageRequest(BaseModel):
     message: str
     collection_name: Optional[str] = settings.VECTOR_STORE_COLLECTION
+    # Optional narrowing of the documents searched
+    owner_id: Optional[int] = None
+    folder_id: Optional[int] = None
+    file_ids: Optional[List[int]] = None
 
 class MessageResponse(BaseModel):
     answer: str
@@ -50,6 +60,10 @@ class ChatHistory(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+class MessagePage(BaseModel):
+    messages: List[dict]
+    next_cursor: Optional[str] = None
+
 class UpdateChatTitleRequest(BaseModel):
     title: str
 
@@ -60,21 +74,57 @@ class ChatListResponse(BaseModel):
     updated_at: datetime
     message_count: int
 
-def get_relevant_documents(query: str, user_id: int, db: Session, k: int = 3):
-    """Retrieve relevant documents using PGVector store"""
+async def embed_query(query: str) -> List[float]:
+    # The embedding client is synchronous; keep it off the event loop
+    return await run_blocking(embeddings.embed_query, query)
+
+def build_retrieval_filter(message_data: MessageRequest, current_user: User) -> RetrievalFilter:
+    """Admins search every document; other users their own plus the shared (admin) ones"""
+    return RetrievalFilter(
+        collection=message_data.collection_name or settings.VECTOR_STORE_COLLECTION,
+        viewer_id=None if current_user.is_admin else current_user.id,
+        share_admin_documents=settings.RETRIEVAL_SHARE_ADMIN_DOCUMENTS,
+        owner_id=message_data.owner_id,
+        folder_id=message_data.folder_id,
+        file_ids=message_data.file_ids
+    )
+
+async def get_relevant_documents(
+    query: str,
+    retrieval_filter: RetrievalFilter,
+    db: AsyncSession,
+    k: Optional[int] = None,
+    query_vector: Optional[List[float]] = None
+):
+    """
+    Retrieve relevant documents using PGVector store. In hybrid mode the
+    vector and full-text results (RETRIEVAL_FANOUT each) are merged with
+    reciprocal rank fusion. retrieval_filter is applied inside the search
+    queries, so the k results all come from documents in scope.
+    """
+    k = k or settings.RETRIEVAL_K
+    hybrid = settings.RETRIEVAL_MODE == "hybrid"
+    fanout = max(k, settings.RETRIEVAL_FANOUT) if hybrid else k
     try:
-        vectorstore = PGVector(
-            connection_string=settings.DATABASE_URL,
-            embedding_function=embeddings,
-            collection_name=settings.VECTOR_STORE_COLLECTION,
-            distance_strategy=settings.VECTOR_DISTANCE_STRATEGY
-        )
-        
-        relevant_docs = vectorstore.similarity_search(
-            query,
-            k=k
-        )
-        return relevant_docs
+        # Embedded before the savepoint is opened, so a provider round-trip
+        # does not hold the request's connection and transaction
+        if query_vector is None:
+            query_vector = await embed_query(query)
+        # Retrieval shares the request session: a failure rolls back only this
+        # savepoint, so objects the caller has loaded (the chat) stay usable
+        async with db.begin_nested():
+            if settings.RETRIEVAL_SOURCE == "chunks":
+                vector_docs = await asearch_document_chunks(db, query_vector, k=fanout, retrieval_filter=retrieval_filter)
+            else:
+                retriever = get_collection_retriever(retrieval_filter.collection)
+                vector_docs = await retriever.asimilarity_search_by_vector(
+                    db, query_vector, k=fanout, retrieval_filter=retrieval_filter
+                )
+            if not hybrid:
+                return vector_docs
+
+            text_docs = await asearch_full_text(db, query, k=fanout, retrieval_filter=retrieval_filter)
+            return reciprocal_rank_fusion([vector_docs, text_docs], k=k)
     except Exception as e:
         print(f"Error retrieving documents from PG Vector: {str(e)}")
         return []
@@ -97,107 +147,310 @@ async def create_new_chat(
     
     return {"id": str(chat.id)}
 
-@router.post("/{chat_id}/message", response_model=MessageResponse)
-async def send_message(
-    chat_id: str,
-    message_data: MessageRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+async def get_user_chat(chat_id: str, user_id: int, db: AsyncSession) -> Chat:
     try:
         chat_id_int = int(chat_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid chat id")
 
-    chat = db.query(Chat).filter(
+    chat = (await db.execute(select(Chat).filter(
         Chat.id == chat_id_int,
-        Chat.user_id == current_user.id
-    ).first()
+        Chat.user_id == user_id
+    ))).scalars().first()
     if not chat:
         raise HTTPException(status_code=404, detail="No data found")
+    return chat
 
-    # Set chat title from the first message if not already set
-    if not chat.title:
-        chat.title = generate_chat_title(message_data.message)
-        db.commit()
-
-    # Normal logic if chat is found
-    relevant_docs = get_relevant_documents(
-        message_data.message,
-        current_user.id,
-        db
-    )
+def build_prompt(question: str, relevant_docs: list) -> str:
     context = "\n\n".join([doc.page_content for doc in relevant_docs])
-    prompt = f"""Based on the following context from the documents, please answer the question. 
+    return f"""Based on the following context from the documents, please answer the question. 
     If the answer cannot be found in the context, say so.
 
     Context:
     {context}
 
-    Question: {message_data.message}
+    Question: {question}
 
     Please provide your answer and cite the sources used."""
-    response = model.generate_content(prompt)
-    answer = response.text
+
+# Chunk references kept on stored citations; the chunk text is fetched on demand
+CITATION_REFERENCE_FIELDS = ("document_id", "chunk_id", "chunk_index", "file_id")
+
+def build_citations(relevant_docs: list) -> List[dict]:
     citations = []
     for doc in relevant_docs:
         filename = doc.metadata.get("filename", "")
         file_type = os.path.splitext(filename)[1].lower() if filename else ""
-        citations.append({
+        citation = {
             "filename": filename,
             "source": doc.metadata.get("source"),
             "content": doc.page_content,
             "file_type": file_type,
             "page": doc.metadata.get("page", None)
-        })
+        }
+        for field in CITATION_REFERENCE_FIELDS:
+            citation[field] = doc.metadata.get(field)
+        citations.append(citation)
+    return citations
+
+def compact_citations(citations: Optional[List[dict]]) -> List[dict]:
+    """
+    Drop the chunk text from citations that reference a chunk. Citations
+    without a chunk reference (stored before references existed) keep
+    their text, since it could not be fetched again.
+    """
+    return [
+        {key: value for key, value in citation.items() if key != "content"}
+        if citation.get("chunk_id") is not None else citation
+        for citation in citations or []
+    ]
+
+def save_chat_message(chat_id: int, query: str, answer: str, citations: List[dict], db: Session) -> ChatMessage:
     chat_message = ChatMessage(
-        chat_id=chat.id,
-        query=message_data.message,
+        chat_id=chat_id,
+        query=query,
         answer=answer,
-        citations=citations
+        citations=compact_citations(citations)
     )
     db.add(chat_message)
     db.commit()
+    return chat_message
+
+async def lookup_cached_answer(
+    query: str,
+    retrieval_filter: RetrievalFilter,
+    db: AsyncSession
+) -> Tuple[Optional[CachedAnswer], Optional[List[float]], int]:
+    """
+    Check the answer cache for an exact, then a near-duplicate, question
+    asked against the same retrieval scope.
+    Returns (hit, query embedding if one was computed, collection version).
+    """
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None, None, 0
+
+    scope = retrieval_filter.cache_key()
+    try:
+        # Savepoint, as in get_relevant_documents: a failure must not expire the chat
+        async with db.begin_nested():
+            version = await answer_cache.current_version(db, retrieval_filter.collection)
+        cached = answer_cache.lookup_exact(scope, query, version)
+        if cached:
+            return cached, None, version
+        query_vector = await embed_query(query)
+        return answer_cache.lookup_similar(scope, query_vector, version), query_vector, version
+    except Exception as e:
+        print(f"Error reading answer cache: {str(e)}")
+        return None, None, 0
+
+def cache_answer(scope: str, query: str, query_vector, answer: str, citations: List[dict], version: int) -> None:
+    # Only cache answers grounded in retrieved documents
+    if settings.ANSWER_CACHE_ENABLED and citations:
+        answer_cache.store(scope, query, query_vector, answer, citations, version)
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/{chat_id}/message", response_model=MessageResponse)
+async def send_message(
+    chat_id: str,
+    message_data: MessageRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    chat = await get_user_chat(chat_id, current_user.id, db)
+    chat_pk = chat.id
+
+    # Set chat title from the first message if not already set
+    if not chat.title:
+        chat.title = generate_chat_title(message_data.message)
+        await db.commit()
+
+    # Normal logic if chat is found
+    retrieval_filter = build_retrieval_filter(message_data, current_user)
+    scope = retrieval_filter.cache_key()
+    cached, query_vector, version = await lookup_cached_answer(message_data.message, retrieval_filter, db)
+    if cached:
+        answer, citations = cached.answer, cached.citations
+    else:
+        relevant_docs = await get_relevant_documents(
+            message_data.message,
+            retrieval_filter,
+            db,
+            query_vector=query_vector
+        )
+        prompt = build_prompt(message_data.message, relevant_docs)
+        response = await model.generate_content_async(prompt)
+        answer = response.text
+        citations = build_citations(relevant_docs)
+        cache_answer(scope, message_data.message, query_vector, answer, citations, version)
+    db.add(ChatMessage(
+        chat_id=chat_pk,
+        query=message_data.message,
+        answer=answer,
+        citations=compact_citations(citations)
+    ))
+    await db.commit()
     return {
         "answer": answer,
         "citations": citations
     }
 
+@router.post("/{chat_id}/message/stream")
+async def stream_message(
+    chat_id: str,
+    message_data: MessageRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Server-Sent Events variant of send_message. Emits a `citations` event,
+    then `delta` events as the answer is generated, then `done` once the
+    message has been saved (or `error` if generation fails).
+    """
+    chat = await get_user_chat(chat_id, current_user.id, db)
+    chat_pk = chat.id
+
+    if not chat.title:
+        chat.title = generate_chat_title(message_data.message)
+        await db.commit()
+
+    retrieval_filter = build_retrieval_filter(message_data, current_user)
+    scope = retrieval_filter.cache_key()
+    cached, query_vector, version = await lookup_cached_answer(message_data.message, retrieval_filter, db)
+    if cached:
+        prompt = None
+        citations = cached.citations
+    else:
+        relevant_docs = await get_relevant_documents(
+            message_data.message,
+            retrieval_filter,
+            db,
+            query_vector=query_vector
+        )
+        prompt = build_prompt(message_data.message, relevant_docs)
+        citations = build_citations(relevant_docs)
+
+    # Sync generator: Starlette iterates it in a worker thread, off the event loop
+    def event_stream():
+        yield sse_event("citations", {"citations": citations})
+
+        parts = []
+        if cached:
+            parts.append(cached.answer)
+            yield sse_event("delta", {"text": cached.answer})
+        else:
+            try:
+                for chunk in model.generate_content(prompt, stream=True):
+                    delta = chunk.text
+                    if delta:
+                        parts.append(delta)
+                        yield sse_event("delta", {"text": delta})
+            except Exception as e:
+                print(f"Error streaming answer for chat {chat_pk}: {str(e)}")
+                yield sse_event("error", {"detail": "Failed to generate answer"})
+                return
+
+        # The request session is gone once streaming starts, so persist with a fresh one
+        answer = "".join(parts)
+        if not cached:
+            cache_answer(scope, message_data.message, query_vector, answer, citations, version)
+        persist_db = SessionLocal()
+        try:
+            chat_message = save_chat_message(chat_pk, message_data.message, answer, citations, persist_db)
+            message_id = chat_message.id
+        finally:
+            persist_db.close()
+        yield sse_event("done", {"message_id": message_id, "answer": answer})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate_chats(query, cursor: Optional[str], limit: Optional[int], response: Response):
+    """
+    Order newest first by (updated_at, id) and apply keyset pagination.
+    Without a limit every chat is returned, as before. With one, the
+    cursor for the next page is sent in the X-Next-Cursor header.
+    """
+    query = query.order_by(Chat.updated_at.desc(), Chat.id.desc())
+    if cursor:
+        query = query.filter(tuple_(Chat.updated_at, Chat.id) < decode_cursor(cursor))
+    if limit is None:
+        return query.all()
+
+    rows = query.limit(limit + 1).all()
+    page = rows[:limit]
+    if len(rows) > limit:
+        last = page[-1] if isinstance(page[-1], Chat) else page[-1][0]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.updated_at, last.id)
+    return page
+
+def serialize_message(msg: ChatMessage, summary: bool = False) -> dict:
+    if summary:
+        return {
+            "id": msg.id,
+            "query": msg.query,
+            "created_at": msg.created_at
+        }
+    return {
+        "id": msg.id,
+        "query": msg.query,
+        "answer": msg.answer,
+        "citations": compact_citations(msg.citations),
+        "created_at": msg.created_at
+    }
+
 @router.get("/history", response_model=List[ChatHistory])
-async def get_chat_history(
+def get_chat_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    summary: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get chat history for the current user"""
-    chats = db.query(Chat).filter(
-        Chat.user_id == current_user.id
-    ).order_by(Chat.updated_at.desc()).all()
-    
-    chat_history = []
-    for chat in chats:
-        messages = db.query(ChatMessage).filter(
-            ChatMessage.chat_id == chat.id
-        ).order_by(ChatMessage.created_at.asc()).all()
-        
-        chat_history.append({
+    """
+    Get chat history for the current user. Messages for the whole page are
+    loaded in one extra query; with summary=true only each message's id,
+    query and timestamp are loaded.
+    """
+    message_loader = selectinload(Chat.messages)
+    if summary:
+        message_loader = message_loader.load_only(ChatMessage.id, ChatMessage.query, ChatMessage.created_at)
+
+    chats = paginate_chats(
+        db.query(Chat).filter(Chat.user_id == current_user.id).options(message_loader),
+        cursor,
+        limit,
+        response
+    )
+
+    return [
+        {
             "id": str(chat.id),
-            "messages": [
-                {
-                    "query": msg.query,
-                    "answer": msg.answer,
-                    "citations": msg.citations,
-                    "created_at": msg.created_at
-                }
-                for msg in messages
-            ],
+            "messages": [serialize_message(msg, summary) for msg in chat.messages],
             "created_at": chat.created_at,
             "updated_at": chat.updated_at
-        })
-    
-    return chat_history
+        }
+        for chat in chats
+    ]
 
 @router.get("/history/{chat_id}", response_model=ChatHistory)
-async def get_specific_chat_history(
+def get_specific_chat_history(
     chat_id: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -219,19 +472,73 @@ async def get_specific_chat_history(
     
     return {
         "id": str(chat.id),
-        "messages": [
-            {
-                "query": msg.query,
-                "answer": msg.answer,
-                "citations": msg.citations,
-                "created_at": msg.created_at
-            }
-            for msg in messages
-        ],
+        "messages": [serialize_message(msg) for msg in messages],
         "created_at": chat.created_at,
         "updated_at": chat.updated_at
     }
 
+@router.get("/history/{chat_id}/messages", response_model=MessagePage)
+def get_chat_messages(
+    chat_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Page through a chat's messages, newest page first. Each page is in
+    chronological order; pass next_cursor to load the page before it.
+    """
+    chat = db.query(Chat).filter(
+        Chat.id == chat_id,
+        Chat.user_id == current_user.id
+    ).first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    query = db.query(ChatMessage).filter(ChatMessage.chat_id == chat.id)
+    if cursor:
+        query = query.filter(tuple_(ChatMessage.created_at, ChatMessage.id) < decode_cursor(cursor))
+    rows = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return {
+        "messages": [serialize_message(msg) for msg in reversed(page)],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/messages/{message_id}/citations")
+def get_message_citations(
+    message_id: int,
+    index: Optional[int] = Query(None, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Full citations, including chunk text, for one message (or one citation with ?index=)"""
+    message = db.query(ChatMessage).join(Chat, ChatMessage.chat_id == Chat.id).filter(
+        ChatMessage.id == message_id,
+        Chat.user_id == current_user.id
+    ).first()
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    citations = list(message.citations or [])
+    if index is not None:
+        if index >= len(citations):
+            raise HTTPException(status_code=404, detail="Citation not found")
+        citations = [citations[index]]
+
+    chunk_ids = [citation["chunk_id"] for citation in citations if citation.get("chunk_id") is not None]
+    chunk_texts = dict(
+        db.query(DocumentChunk.id, DocumentChunk.chunk_text).filter(DocumentChunk.id.in_(chunk_ids)).all()
+    ) if chunk_ids else {}
+
+    return [
+        {**citation, "content": chunk_texts.get(citation.get("chunk_id"), citation.get("content"))}
+        for citation in citations
+    ]
+
 @router.delete("/{chat_id}")
 async def delete_chat(
     chat_id: str,
@@ -278,28 +585,38 @@ async def update_chat_title(
     return {"message": "Title updated successfully", "title": chat.title}
 
 @router.get("/all", response_model=List[ChatListResponse])
-async def get_all_chats(
+def get_all_chats(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all chats for the current user with basic information"""
-    chats = db.query(Chat).filter(
+    # Count messages for all of the user's chats in one grouped subquery
+    message_counts = db.query(
+        ChatMessage.chat_id,
+        func.count(ChatMessage.id).label("message_count")
+    ).join(Chat, ChatMessage.chat_id == Chat.id).filter(
         Chat.user_id == current_user.id
-    ).order_by(Chat.updated_at.desc()).all()
-    
-    chat_list = []
-    for chat in chats:
-        # Get message count for each chat
-        message_count = db.query(ChatMessage).filter(
-            ChatMessage.chat_id == chat.id
-        ).count()
-        
-        chat_list.append({
+    ).group_by(ChatMessage.chat_id).subquery()
+
+    rows = paginate_chats(
+        db.query(Chat, func.coalesce(message_counts.c.message_count, 0)).outerjoin(
+            message_counts, message_counts.c.chat_id == Chat.id
+        ).filter(Chat.user_id == current_user.id),
+        cursor,
+        limit,
+        response
+    )
+
+    return [
+        {
             "id": str(chat.id),
             "title": chat.title,
             "created_at": chat.created_at,
             "updated_at": chat.updated_at,
             "message_count": message_count
-        })
-    
-    return chat_list 
\ No newline at end of file
+        }
+        for chat, message_count in rows
+    ]
\ No newline at end of file
@@ -1,19 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request, Response, status
+from starlette.requests import ClientDisconnect
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import shutil
+import uuid
 from datetime import datetime
 
 from ..utils.database import get_db
 from ..utils.security import get_current_user
-from ..utils.document_processor import process_document
+from ..utils.ingestion_queue import enqueue_file, get_latest_job, is_ingestible
+from ..utils.compaction import tombstone_files
+from ..utils.folder_tree import soft_delete_folder_tree
+from ..utils.file_serving import readable_file, serve_file, file_etag, etag_matches, CACHE_CONTROL
+from ..utils.page_preview import get_page, clamp_dpi, PageCache, PageNotFound, FORMAT_MEDIA_TYPES
+from ..utils.concurrency import run_blocking
+from ..utils.uploads import (
+    HashingWriter, UploadTooLarge, UploadBusy, write_stream, iter_upload_file, temp_upload_path,
+    session_writer, release_session, session_digest, forget_session,
+    upload_dir_for, store_content, is_path_in_use
+)
+from ..models.ingestion_job import MODE_REINDEX
 from ..models.user import User
 from ..models.file_system import Folder, File as DBFile
+from ..models.document import Document, DocumentChunk
+from ..models.upload_session import UploadSession, UPLOAD_ACTIVE, UPLOAD_COMPLETED, UPLOAD_ABORTED
 from ..schemas.file_system import (
     FolderCreate, Folder as FolderResponse, 
     FileCreate, File as FileResponse, 
-    FileSystemItem
+    FileSystemItem, IngestionStatus, UploadInit, UploadSessionStatus
 )
 from ..config import settings
 
@@ -122,14 +138,8 @@ async def list_items(
     
     return items
 
-@router.post("/upload", response_model=FileResponse)
-async def upload_file(
-    file: UploadFile = File(...),
-    folder_id: Optional[int] = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-): 
-    # Validate folder if provided
+def check_upload_target(db: Session, user: User, folder_id: Optional[int], file_name: str) -> None:
+    """404 for a missing folder, 409 if the folder already has a file of that name"""
     if folder_id:
         folder = db.query(Folder).filter(
             Folder.id == folder_id,
@@ -137,87 +147,256 @@ async def upload_file(
         ).first()
         if not folder:
             raise HTTPException(status_code=404, detail="Folder not found")
-            
-    # Check if file with same name exists in the folder
+
     existing_file = db.query(DBFile).filter(
-        DBFile.name == file.filename,
+        DBFile.name == file_name,
         DBFile.folder_id == folder_id,
-        DBFile.created_by == current_user.id,
+        DBFile.created_by == user.id,
         DBFile.is_deleted == False
     ).first()
-    
     if existing_file:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail=f"File with name '{file.filename}' already exists in this folder"
+            detail=f"File with name '{file_name}' already exists in this folder"
         )
-            
-    # Create base upload directory
-    base_upload_dir = os.path.join(settings.UPLOAD_DIR, str(current_user.id))
-    os.makedirs(base_upload_dir, exist_ok=True)
-
-    # If folder_id is provided, create folder-specific path
-    if folder_id:
-        folder_path = []
-        current_folder = folder
-        while current_folder:
-            folder_path.insert(0, str(current_folder.id))
-            if current_folder.parent_id:
-                current_folder = db.query(Folder).filter(
-                    Folder.id == current_folder.parent_id,
-                    Folder.created_by == current_user.id,
-                    Folder.is_deleted == False
-                ).first()
-            else:
-                current_folder = None
-        
-        upload_dir = os.path.join(base_upload_dir, *folder_path)
-        os.makedirs(upload_dir, exist_ok=True)
-    else:
-        upload_dir = base_upload_dir
-
-    # Use original filename
-    file_path = os.path.join(upload_dir, file.filename)
 
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+def create_file_record(
+    db: Session,
+    user: User,
+    folder_id: Optional[int],
+    file_name: str,
+    content_type: Optional[str],
+    temp_path: str,
+    content_hash: str,
+    size: int
+) -> DBFile:
+    """Move received content into the upload tree, record it and queue ingestion"""
+    upload_dir = upload_dir_for(db, user.id, folder_id)
+    file_path = store_content(db, temp_path, content_hash, size, os.path.join(upload_dir, file_name))
 
-    # Get file size
-    file_size = os.path.getsize(file_path)
-
-    # Create file record
     db_file = DBFile(
-        name=file.filename,
-        original_name=file.filename,
+        name=file_name,
+        original_name=file_name,
         file_path=file_path,
-        file_type=file.content_type,
-        size=file_size,
+        file_type=content_type,
+        size=size,
+        content_hash=content_hash,
         folder_id=folder_id,
-        created_by=current_user.id
+        created_by=user.id
     )
-
     db.add(db_file)
     db.commit()
     db.refresh(db_file)
 
-    # Process document if it's a text file
-    #file_ext = os.path.splitext(file.filename)[1].lower()
-    #if file_ext in ['.txt', '.pdf', '.docx']:
-    #    try:
-    #        await process_document(
-    #            file_path=file_path,
-    #            file_name=file.filename,
-    #            user_id=current_user.id,
-    #            db=db
-    #        )
-    #    except Exception as e:
-    #        # Log the error but don't fail the upload
-    #        print(f"Error processing document: {str(e)}")
-    #else:
-    #    print(f"Unsupported file extension: {file_ext}")
+    # Queue the document for the ingestion worker instead of processing it inline
+    if is_ingestible(file_name):
+        enqueue_file(db, db_file)
+    else:
+        print(f"Unsupported file extension: {os.path.splitext(file_name)[1].lower()}")
     return db_file
 
+async def receive_upload(file: UploadFile) -> tuple:
+    """Stream an UploadFile to a temp file. Returns (temp path, sha256, size)."""
+    temp_path = temp_upload_path()
+    writer = HashingWriter(temp_path)
+    try:
+        size = await write_stream(iter_upload_file(file), writer, settings.MAX_FILE_SIZE)
+    except UploadTooLarge as e:
+        writer.close()
+        os.remove(temp_path)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception:
+        writer.close()
+        os.remove(temp_path)
+        raise
+    writer.close()
+    return temp_path, writer.sha256.hexdigest(), size
+
+@router.post("/upload", response_model=FileResponse)
+async def upload_file(
+    file: UploadFile = File(...),
+    folder_id: Optional[int] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+): 
+    check_upload_target(db, current_user, folder_id, file.filename)
+
+    # Hash and enforce MAX_FILE_SIZE while the body is written to disk
+    temp_path, content_hash, size = await receive_upload(file)
+    return create_file_record(
+        db, current_user, folder_id, file.filename, file.content_type, temp_path, content_hash, size
+    )
+
+def get_upload_session(db: Session, upload_id: str, user: User, lock: bool = False) -> UploadSession:
+    """
+    With lock, the row is locked until the next commit so parts of one upload
+    are written by one request at a time, whichever process receives them.
+    The lock is not waited for (that would stall the event loop): a session
+    locked by another request is a 409.
+    """
+    query = db.query(UploadSession).filter(
+        UploadSession.id == upload_id,
+        UploadSession.user_id == user.id
+    )
+    if lock:
+        query = query.with_for_update(nowait=True)
+    try:
+        session = query.first()
+    except OperationalError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Another part of this upload is still being received")
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+def upload_status(session: UploadSession) -> UploadSessionStatus:
+    return UploadSessionStatus(
+        id=session.id,
+        file_name=session.file_name,
+        size=session.size,
+        received_bytes=session.received_bytes,
+        part_size=settings.UPLOAD_PART_SIZE,
+        status=session.status,
+        file_id=session.file_id
+    )
+
+@router.post("/uploads", response_model=UploadSessionStatus)
+async def init_upload(
+    upload: UploadInit,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a chunked upload. Send the content with PUT /uploads/{id}?offset=N
+    in order (any part size), then POST /uploads/{id}/complete. After a
+    dropped connection, GET /uploads/{id} tells where to resume.
+    """
+    if upload.size < 0 or upload.size > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size must be at most {settings.MAX_FILE_SIZE} bytes"
+        )
+    check_upload_target(db, current_user, upload.folder_id, upload.file_name)
+
+    upload_id = str(uuid.uuid4())
+    temp_path = temp_upload_path(upload_id)
+    open(temp_path, "wb").close()
+    session = UploadSession(
+        id=upload_id,
+        user_id=current_user.id,
+        folder_id=upload.folder_id,
+        file_name=upload.file_name,
+        content_type=upload.content_type,
+        size=upload.size,
+        received_bytes=0,
+        expected_sha256=upload.sha256.lower() if upload.sha256 else None,
+        temp_path=temp_path,
+        status=UPLOAD_ACTIVE
+    )
+    db.add(session)
+    db.commit()
+    return upload_status(session)
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def get_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return upload_status(get_upload_session(db, upload_id, current_user))
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def upload_part(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Append the raw request body at offset, which must equal received_bytes"""
+    # Locked before the offset check; released by the commit below
+    session = get_upload_session(db, upload_id, current_user, lock=True)
+    if session.status != UPLOAD_ACTIVE:
+        raise HTTPException(status_code=409, detail=f"Upload is {session.status}")
+    if offset != session.received_bytes:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Expected offset {session.received_bytes}",
+            headers={"Upload-Offset": str(session.received_bytes)}
+        )
+
+    try:
+        writer = await run_blocking(session_writer, session)
+    except UploadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    # Bytes that made it to disk before the connection dropped are kept
+    received = session.received_bytes
+    try:
+        await write_stream(request.stream(), writer, session.size)
+        received = writer.offset
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Part goes past the declared size of {session.size} bytes"
+        )
+    except ClientDisconnect:
+        received = writer.offset
+    finally:
+        writer.close()
+        release_session(session, writer, received)
+        if received != session.received_bytes:
+            session.received_bytes = received
+        db.commit()
+    return upload_status(session)
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileResponse)
+async def complete_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    session = get_upload_session(db, upload_id, current_user, lock=True)
+    if session.status != UPLOAD_ACTIVE:
+        raise HTTPException(status_code=409, detail=f"Upload is {session.status}")
+    if session.received_bytes != session.size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Received {session.received_bytes} of {session.size} bytes",
+            headers={"Upload-Offset": str(session.received_bytes)}
+        )
+
+    content_hash = await run_blocking(session_digest, session)
+    if session.expected_sha256 and session.expected_sha256 != content_hash:
+        forget_session(session)
+        session.status = UPLOAD_ABORTED
+        db.commit()
+        raise HTTPException(status_code=422, detail="Content does not match the declared sha256")
+
+    # The name may have been taken while the upload was running
+    check_upload_target(db, current_user, session.folder_id, session.file_name)
+    db_file = create_file_record(
+        db, current_user, session.folder_id, session.file_name, session.content_type,
+        session.temp_path, content_hash, session.size
+    )
+    session.status = UPLOAD_COMPLETED
+    session.file_id = db_file.id
+    db.commit()
+    return db_file
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    session = get_upload_session(db, upload_id, current_user)
+    if session.status == UPLOAD_ACTIVE:
+        forget_session(session)
+        session.status = UPLOAD_ABORTED
+        db.commit()
+    return {"message": "Upload aborted"}
+
 @router.delete("/folders/{folder_id}")
 async def delete_folder(
     folder_id: int,
@@ -233,24 +412,11 @@ async def delete_folder(
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    # Soft delete the folder
-    folder.is_deleted = True
-    
-    # Soft delete all files in the folder
-    for file in folder.files:
-        file.is_deleted = True
-    
-    # Recursively soft delete all subfolders and their contents
-    def delete_subfolders(folder):
-        for subfolder in folder.subfolders:
-            if not subfolder.is_deleted:
-                subfolder.is_deleted = True
-                for file in subfolder.files:
-                    file.is_deleted = True
-                delete_subfolders(subfolder)
-    
-    delete_subfolders(folder)
+    # Soft delete the folder, all subfolders and their files in one statement
+    _, deleted_file_ids = soft_delete_folder_tree(db, folder.id)
     
+    # Chunks stay until compaction, but drop out of retrieval now
+    tombstone_files(db, deleted_file_ids)
     db.commit()
     return {"message": "Folder and its contents deleted successfully"}
 
@@ -269,8 +435,139 @@ async def delete_file(
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
 
-    # Soft delete the file
+    # Soft delete the file; its chunks drop out of retrieval now and are purged by compaction
     file.is_deleted = True
+    tombstone_files(db, [file.id])
     db.commit()
     
-    return {"message": "File deleted successfully"} 
\ No newline at end of file
+    return {"message": "File deleted successfully"}
+
+@router.put("/files/{file_id}", response_model=FileResponse)
+async def replace_file(
+    file_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a new revision of a file. Its document is re-indexed
+    incrementally: only new or changed chunks are embedded.
+    """
+    db_file = db.query(DBFile).filter(
+        DBFile.id == file_id,
+        DBFile.created_by == current_user.id,
+        DBFile.is_deleted == False
+    ).first()
+    if not db_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    if os.path.splitext(file.filename)[1].lower() != os.path.splitext(db_file.name)[1].lower():
+        raise HTTPException(status_code=400, detail="Replacement must have the same file type")
+
+    temp_path, content_hash, size = await receive_upload(file)
+
+    # Swap the new content in; a path shared with identical uploads is left alone
+    file_path = db_file.file_path
+    if is_path_in_use(db, file_path, exclude_file_id=db_file.id):
+        stem, ext = os.path.splitext(file_path)
+        file_path = f"{stem}-{content_hash[:12]}{ext}"
+    shutil.move(temp_path, file_path)
+
+    db_file.file_path = file_path
+    db_file.size = size
+    db_file.content_hash = content_hash
+    db_file.file_type = file.content_type or db_file.file_type
+    db_file.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(db_file)
+
+    if is_ingestible(db_file.name):
+        enqueue_file(db, db_file, mode=MODE_REINDEX)
+    return db_file
+
+@router.get("/files/{file_id}/ingestion", response_model=IngestionStatus)
+async def get_ingestion_status(
+    file_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    file = db.query(DBFile).filter(
+        DBFile.id == file_id,
+        DBFile.created_by == current_user.id
+    ).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    job = get_latest_job(db, file.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No ingestion job found for this file")
+    return job
+
+@router.api_route("/files/{file_id}/content", methods=["GET", "HEAD"])
+async def get_file_content(
+    file_id: int,
+    request: Request,
+    download: bool = False,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream a file's content, with single Range requests (206/416), a strong
+    ETag from the content hash for If-None-Match (304) and If-Range, and
+    optional X-Accel-Redirect / X-Sendfile offload (FILE_SERVING_OFFLOAD).
+    """
+    file = readable_file(db, file_id, current_user)
+    return await serve_file(
+        db,
+        file,
+        range_header=range_header,
+        if_none_match=if_none_match,
+        if_range=if_range,
+        download=download,
+        head=request.method == "HEAD"
+    )
+
+@router.get("/files/{file_id}/pages/{page}")
+async def get_file_page(
+    file_id: int,
+    page: int,
+    fmt: str = Query("png", alias="format", pattern="^(text|png)$"),
+    dpi: Optional[int] = Query(None, ge=1),
+    highlight: Optional[int] = Query(None, description="Chunk id to highlight on the page"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    One page of a PDF, for citation previews: a PNG, or JSON with the page
+    text. `page` is 0-based, as in citation metadata. With `highlight`, the
+    chunk's text is marked on the image or returned as a [start, end) span.
+    """
+    file = readable_file(db, file_id, current_user)
+    if os.path.splitext(file.name)[1].lower() != ".pdf":
+        raise HTTPException(status_code=400, detail="Page previews are only available for PDF files")
+
+    highlight_text = highlight_hash = None
+    if highlight is not None:
+        chunk = db.query(DocumentChunk).join(Document, Document.id == DocumentChunk.document_id).filter(
+            DocumentChunk.id == highlight,
+            Document.file_id == file.id
+        ).first()
+        if not chunk:
+            raise HTTPException(status_code=404, detail="Chunk not found")
+        highlight_text, highlight_hash = chunk.chunk_text, chunk.content_hash
+
+    await file_etag(db, file)
+    dpi = clamp_dpi(dpi)
+    etag = f'"{PageCache.key(file.content_hash, page, fmt, dpi, highlight_hash)}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data = await get_page(file.file_path, file.content_hash, page, fmt, dpi, highlight_text, highlight_hash)
+    except PageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return Response(content=data, media_type=FORMAT_MEDIA_TYPES[fmt], headers=headers)
@@ -63,4 +63,40 @@ class FileSystemItem(BaseModel):
     file_type: Optional[str] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class IngestionStatus(BaseModel):
+    id: int
+    file_id: int
+    status: str
+    mode: Optional[str] = None
+    stage: Optional[str] = None
+    progress: float
+    attempts: int
+    error: Optional[str] = None
+    document_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+class UploadInit(BaseModel):
+    file_name: str
+    size: int
+    folder_id: Optional[int] = None
+    content_type: Optional[str] = None
+    sha256: Optional[str] = None  # If given, checked when the upload completes
+
+class UploadSessionStatus(BaseModel):
+    id: str
+    file_name: str
+    size: int
+    received_bytes: int
+    part_size: int
+    status: str
+    file_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
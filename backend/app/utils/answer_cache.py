@@ -0,0 +1,184 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.document import CollectionVersion
+from ..config import settings
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop surrounding punctuation"""
+    return re.sub(r"\s+", " ", query.lower()).strip(" \t\n?!.,;:")
+
+def bump_collection_version(db: Session, collection_name: str) -> None:
+    """Mark a collection as changed; takes effect when the caller commits"""
+    db.execute(
+        text(
+            "INSERT INTO collection_versions (name, version, updated_at) VALUES (:name, 1, now()) "
+            "ON CONFLICT (name) DO UPDATE SET version = collection_versions.version + 1, updated_at = now()"
+        ),
+        {"name": collection_name}
+    )
+
+@dataclass
+class CachedAnswer:
+    query: str
+    vector: Optional[np.ndarray]
+    answer: str
+    citations: List[dict]
+    version: int
+    created_at: float = field(default_factory=time.monotonic)
+
+class AnswerCache:
+    """
+    Per-scope cache of generated answers, where a scope is a collection
+    plus any retrieval filter. Lookups try the normalized query text first,
+    then the closest cached query embedding above similarity_threshold.
+    Entries expire after ttl_seconds, the least recently used are evicted
+    past max_entries, and a scope is dropped when the collection_versions
+    row of its collection changes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, similarity_threshold: float, version_ttl: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_ttl = version_ttl
+        self._scopes: Dict[str, "OrderedDict[str, CachedAnswer]"] = {}
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def current_version(self, db: AsyncSession, collection_name: str) -> int:
+        """Collection version, re-read from the database at most every version_ttl seconds"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(collection_name)
+        if cached and now - cached[1] < self.version_ttl:
+            return cached[0]
+        # Not under the lock: it is threading.Lock and the query awaits
+        version = (await db.execute(
+            select(CollectionVersion.version).filter(CollectionVersion.name == collection_name)
+        )).scalar() or 0
+        with self._lock:
+            self._versions[collection_name] = (version, now)
+        return version
+
+    def _entries(self, scope: str, version: int) -> "OrderedDict[str, CachedAnswer]":
+        """Entries for scope, dropping them all if they predate version. Caller holds the lock."""
+        entries = self._scopes.setdefault(scope, OrderedDict())
+        if entries and next(iter(entries.values())).version != version:
+            entries.clear()
+            self.invalidations += 1
+        return entries
+
+    def _is_fresh(self, entry: CachedAnswer) -> bool:
+        return time.monotonic() - entry.created_at < self.ttl_seconds
+
+    def lookup_exact(self, scope: str, query: str, version: int) -> Optional[CachedAnswer]:
+        key = normalize_query(query)
+        with self._lock:
+            entries = self._entries(scope, version)
+            entry = entries.get(key)
+            if entry and not self._is_fresh(entry):
+                del entries[key]
+                entry = None
+            if entry:
+                entries.move_to_end(key)
+                self.exact_hits += 1
+            return entry
+
+    def lookup_similar(self, scope: str, query_vector: List[float], version: int) -> Optional[CachedAnswer]:
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        with self._lock:
+            entries = self._entries(scope, version)
+            for key in [key for key, entry in entries.items() if not self._is_fresh(entry)]:
+                del entries[key]
+            candidates = [(key, entry) for key, entry in entries.items() if entry.vector is not None]
+            if not candidates or not norm:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([entry.vector for _, entry in candidates])
+            scores = matrix @ (vector / norm)
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            key, entry = candidates[best]
+            entries.move_to_end(key)
+            self.semantic_hits += 1
+            return entry
+
+    def store(
+        self,
+        scope: str,
+        query: str,
+        query_vector: Optional[List[float]],
+        answer: str,
+        citations: List[dict],
+        version: int
+    ) -> None:
+        vector = None
+        if query_vector is not None:
+            vector = np.asarray(query_vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else None
+        with self._lock:
+            entries = self._entries(scope, version)
+            entries[normalize_query(query)] = CachedAnswer(
+                query=query, vector=vector, answer=answer, citations=citations, version=version
+            )
+            entries.move_to_end(normalize_query(query))
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        """Drop every scope of collection_name, or everything"""
+        with self._lock:
+            scopes = [
+                scope for scope in self._scopes
+                if collection_name is None or scope.split("|", 1)[0] == collection_name
+            ]
+            for scope in scopes:
+                self._scopes.pop(scope, None)
+            if collection_name is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(collection_name, None)
+            self.invalidations += len(scopes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": {scope: len(entries) for scope, entries in self._scopes.items()},
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# Process-wide answer cache used by the chat routes
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+    version_ttl=settings.ANSWER_CACHE_VERSION_TTL
+)
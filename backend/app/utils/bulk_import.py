@@ -0,0 +1,310 @@
+import mimetypes
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .document_processor import (
+    SUPPORTED_EXTENSIONS,
+    iter_text_units,
+    iter_document_chunks,
+    create_document_record,
+    initialize_embeddings,
+    embed_chunks,
+    store_chunks_with_embeddings,
+)
+from .folder_tree import folder_ancestor_ids
+from .uploads import HashingWriter, READ_SIZE, temp_upload_path, store_content
+from ..models.file_system import Folder, File as DBFile
+from ..models.ingestion_job import IngestionJob, JOB_COMPLETED, JOB_FAILED
+from ..config import settings
+
+@dataclass
+class ImportItem:
+    """A file placed under UPLOAD_DIR, waiting to be parsed"""
+    name: str
+    file_path: str
+    folder_id: Optional[int]
+    content_hash: str
+    size: int
+
+@dataclass
+class ParsedFile:
+    file_path: str
+    file_name: str
+    chunks: list = field(default_factory=list)
+    pages: int = 0
+    parse_seconds: float = 0.0
+    error: Optional[str] = None
+
+@dataclass
+class BulkImportStats:
+    files: int = 0
+    failed: int = 0
+    skipped: int = 0
+    pages: int = 0
+    chunks: int = 0
+    parse_seconds: float = 0.0  # Summed over worker processes
+    embed_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+    def report(self) -> dict:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "files": self.files,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(elapsed, 2),
+            "pages_per_second": round(self.pages / elapsed, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 2),
+            "parse_pages_per_cpu_second": round(self.pages / self.parse_seconds, 2) if self.parse_seconds else None,
+            "embed_store_seconds": round(self.embed_seconds, 2),
+        }
+
+def parse_file(file_path: str, file_name: str) -> ParsedFile:
+    """Extract and chunk one file. Runs in a worker process, so it must stay importable at module level."""
+    started = time.process_time()
+    pages = 0
+
+    def counted(units):
+        nonlocal pages
+        for unit in units:
+            # DOCX / TXT units are arbitrary slices of text; count those files as one page
+            if 'page' in unit.metadata or pages == 0:
+                pages += 1
+            yield unit
+
+    try:
+        chunks = list(iter_document_chunks(counted(iter_text_units(file_path, file_name))))
+        return ParsedFile(
+            file_path=file_path,
+            file_name=file_name,
+            chunks=chunks,
+            pages=pages,
+            parse_seconds=time.process_time() - started
+        )
+    except Exception as e:
+        return ParsedFile(file_path=file_path, file_name=file_name, error=str(e), parse_seconds=time.process_time() - started)
+
+def is_safe_member(member: tarfile.TarInfo) -> bool:
+    """Regular files with a relative path that stays inside the extraction root"""
+    if not member.isfile():
+        return False
+    path = os.path.normpath(member.name)
+    return not os.path.isabs(path) and not path.startswith("..")
+
+def iter_source(source: str) -> Iterator[Tuple[str, Callable]]:
+    """
+    Yield (relative path, open_source()) for every supported file in a
+    directory or tarball, open_source returning a binary file object. Tar
+    members are streamed out one at a time, never extracted wholesale.
+    """
+    def supported(name: str) -> bool:
+        return os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if supported(name):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), lambda path=path: open(path, "rb")
+        return
+
+    if not tarfile.is_tarfile(source):
+        raise ValueError(f"{source} is neither a directory nor a tar archive")
+
+    with tarfile.open(source) as archive:
+        for member in archive:
+            if not is_safe_member(member) or not supported(member.name):
+                continue
+
+            yield os.path.normpath(member.name), lambda member=member: archive.extractfile(member)
+
+class FolderResolver:
+    """Maps directories of the source onto Folder rows, creating them as needed"""
+
+    def __init__(self, db: Session, user_id: int, root_folder_id: Optional[int]):
+        self.db = db
+        self.user_id = user_id
+        self.root_folder_id = root_folder_id
+        self._ids = {(): root_folder_id}
+        # Folder ids from the top level down, as used for upload paths
+        root_path = [str(ancestor_id) for ancestor_id in folder_ancestor_ids(db, root_folder_id, user_id)] if root_folder_id else []
+        self._paths = {root_folder_id: root_path}
+
+    def resolve(self, parts: Tuple[str, ...]) -> Optional[int]:
+        if parts in self._ids:
+            return self._ids[parts]
+        parent_id = self.resolve(parts[:-1])
+        folder = self.db.query(Folder).filter(
+            Folder.name == parts[-1],
+            Folder.parent_id == parent_id,
+            Folder.created_by == self.user_id,
+            Folder.is_deleted == False
+        ).first()
+        if not folder:
+            folder = Folder(name=parts[-1], parent_id=parent_id, created_by=self.user_id)
+            self.db.add(folder)
+            self.db.commit()
+        self._ids[parts] = folder.id
+        self._paths[folder.id] = self._paths[parent_id] + [str(folder.id)]
+        return folder.id
+
+    def upload_dir(self, folder_id: Optional[int]) -> str:
+        return os.path.join(settings.UPLOAD_DIR, str(self.user_id), *self._paths[folder_id])
+
+def copy_to_temp(open_source: Callable) -> Tuple[str, str, int]:
+    """Copy one source file to a temp upload path. Returns (temp path, sha256, size)."""
+    temp_path = temp_upload_path()
+    writer = HashingWriter(temp_path)
+    try:
+        with open_source() as src:
+            while True:
+                data = src.read(READ_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+    except Exception:
+        writer.close()
+        os.remove(temp_path)
+        raise
+    writer.close()
+    return temp_path, writer.sha256.hexdigest(), writer.offset
+
+def place_files(source: str, user_id: int, folder_id: Optional[int], db: Session, stats: BulkImportStats) -> Iterator[ImportItem]:
+    """
+    Copy source files into the upload directory, mirroring subdirectories as
+    folders. Content goes through store_content like an upload, so it is
+    shared with identical stored files and never overwrites a path that
+    still backs another File row.
+    """
+    folders = FolderResolver(db, user_id, folder_id)
+    for relative_path, open_source in iter_source(source):
+        parts = tuple(relative_path.split(os.sep))
+        name = parts[-1]
+        target_folder_id = folders.resolve(parts[:-1])
+
+        exists = db.query(DBFile.id).filter(
+            DBFile.name == name,
+            DBFile.folder_id == target_folder_id,
+            DBFile.created_by == user_id,
+            DBFile.is_deleted == False
+        ).first()
+        if exists:
+            stats.skipped += 1
+            continue
+
+        upload_dir = folders.upload_dir(target_folder_id)
+        os.makedirs(upload_dir, exist_ok=True)
+        temp_path, content_hash, size = copy_to_temp(open_source)
+        file_path = store_content(db, temp_path, content_hash, size, os.path.join(upload_dir, name))
+        yield ImportItem(
+            name=name, file_path=file_path, folder_id=target_folder_id, content_hash=content_hash, size=size
+        )
+
+def store_parsed_file(
+    item: ImportItem,
+    parsed: ParsedFile,
+    user_id: int,
+    collection_name: str,
+    embeddings,
+    db: Session,
+    stats: BulkImportStats
+) -> None:
+    """Record the file and, if it parsed, embed and store its chunks"""
+    db_file = DBFile(
+        name=item.name,
+        original_name=item.name,
+        file_path=item.file_path,
+        file_type=mimetypes.guess_type(item.name)[0],
+        size=item.size,
+        content_hash=item.content_hash,
+        folder_id=item.folder_id,
+        created_by=user_id
+    )
+    db.add(db_file)
+    db.commit()
+
+    job = IngestionJob(file_id=db_file.id, stage="bulk_import", attempts=1, worker_id="bulk_import")
+    stats.parse_seconds += parsed.parse_seconds
+    try:
+        if parsed.error:
+            raise ValueError(parsed.error)
+        started = time.perf_counter()
+        db_document = create_document_record(
+            item.name, item.file_path, user_id, db, file_id=db_file.id, collection_name=collection_name
+        )
+        vectors = embed_chunks(parsed.chunks, embeddings)
+        store_chunks_with_embeddings(parsed.chunks, vectors, db_document, db, collection_name)
+        stats.embed_seconds += time.perf_counter() - started
+        stats.files += 1
+        stats.pages += parsed.pages
+        stats.chunks += len(parsed.chunks)
+        job.status, job.stage, job.progress, job.document_id = JOB_COMPLETED, "done", 1.0, db_document.id
+    except Exception as e:
+        print(f"Error importing {item.file_path}: {str(e)}")
+        db.rollback()
+        stats.failed += 1
+        job.status, job.stage, job.error = JOB_FAILED, "failed", str(e)
+    db.add(job)
+    db.commit()
+
+def bulk_import(
+    source: str,
+    user_id: int,
+    db: Session,
+    folder_id: Optional[int] = None,
+    collection_name: Optional[str] = None,
+    workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    Import every supported file in a directory or tarball:
+    1. Copy each file under UPLOAD_DIR, creating folders for subdirectories
+    2. Parse and chunk in a pool of worker processes
+    3. Embed and store results in this process as they complete, while the
+       pool keeps parsing ahead (at most 2 * workers files in flight)
+
+    Returns throughput figures, see BulkImportStats.report.
+    """
+    workers = max(1, workers or settings.BULK_IMPORT_WORKERS)
+    collection_name = collection_name or settings.VECTOR_STORE_COLLECTION
+    embeddings = initialize_embeddings()
+    stats = BulkImportStats()
+    items = place_files(source, user_id, folder_id, db, stats)
+    in_flight = {}
+    ready = deque()
+    exhausted = False
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def fill():
+            nonlocal exhausted
+            while not exhausted and len(in_flight) < workers * 2:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    return
+                in_flight[pool.submit(parse_file, item.file_path, item.name)] = item
+
+        fill()
+        while in_flight or ready:
+            if not ready:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                ready.extend((in_flight.pop(future), future) for future in finished)
+
+            # Embedding is network bound; keep the pool parsing meanwhile
+            item, future = ready.popleft()
+            fill()
+            store_parsed_file(item, future.result(), user_id, collection_name, embeddings, db, stats)
+            if progress_callback:
+                progress_callback(stats.report())
+
+    return stats.report()
@@ -0,0 +1,145 @@
+import io
+import json
+import struct
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .vector_store import EMBEDDING_TABLE, get_or_create_collection_id, collection_metadata
+from .embedding_cache import content_hash
+from ..models.document import Document
+from ..config import settings
+
+# Binary COPY framing, see "Binary Format" in the Postgres COPY documentation
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER = COPY_SIGNATURE + struct.pack(">ii", 0, 0)
+COPY_TRAILER = struct.pack(">h", -1)
+NULL_FIELD = struct.pack(">i", -1)
+
+CHUNK_COLUMNS = ("id", "document_id", "chunk_text", "chunk_index", "embedding", "chunk_metadata", "content_hash")
+EMBEDDING_COLUMNS = ("uuid", "collection_id", "embedding", "document", "cmetadata", "custom_id")
+
+def encode_int4(value: Optional[int]) -> bytes:
+    return NULL_FIELD if value is None else struct.pack(">ii", 4, value)
+
+def encode_text(value: Optional[str]) -> bytes:
+    if value is None:
+        return NULL_FIELD
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+def encode_jsonb(value: Optional[str]) -> bytes:
+    """jsonb's binary form is a version byte followed by the JSON text"""
+    if value is None:
+        return NULL_FIELD
+    data = b"\x01" + value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+def encode_uuid(value: str) -> bytes:
+    return struct.pack(">i", 16) + uuid.UUID(value).bytes
+
+def encode_vector(vector: List[float]) -> bytes:
+    """pgvector's binary form: int16 dimensions, int16 unused, float4 values"""
+    dim = len(vector)
+    return struct.pack(f">iHH{dim}f", 4 + 4 * dim, dim, 0, *vector)
+
+def copy_statement(table: str, columns) -> str:
+    return f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)"
+
+class ChunkCopyWriter:
+    """
+    Buffers document_chunks rows and their PGVector rows as binary COPY
+    data and streams them into Postgres every flush_size chunks. Chunk ids
+    are taken from the sequence up front so the PGVector rows can refer to
+    them. Runs on the session's connection, inside its transaction; nothing
+    is committed here.
+    """
+
+    def __init__(self, db: Session, collection_name: str, flush_size: Optional[int] = None):
+        self.db = db
+        self.collection_name = collection_name
+        self.flush_size = flush_size or settings.CHUNK_COPY_FLUSH_SIZE
+        self.collection_id = get_or_create_collection_id(db, collection_name)
+        # langchain has created cmetadata as json and as jsonb over time
+        metadata_type = db.execute(
+            text(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = 'cmetadata'"
+            ),
+            {"table": EMBEDDING_TABLE}
+        ).scalar()
+        self.encode_cmetadata = encode_jsonb if metadata_type == "jsonb" else encode_text
+        self._chunks = io.BytesIO()
+        self._embeddings = io.BytesIO()
+        self.pending = 0
+        self.written = 0
+
+    def allocate_ids(self, count: int) -> List[int]:
+        return self.db.execute(
+            text("SELECT nextval(pg_get_serial_sequence('document_chunks', 'id')) FROM generate_series(1, :count)"),
+            {"count": count}
+        ).scalars().all()
+
+    def add(
+        self,
+        db_document: Document,
+        chunks: list,
+        vectors: List[List[float]],
+        chunk_indexes: List[int]
+    ) -> List[int]:
+        """Buffer chunks; returns their document_chunks ids"""
+        if not chunks:
+            return []
+        chunk_ids = self.allocate_ids(len(chunks))
+        collection_field = encode_uuid(self.collection_id)
+        chunk_field_count = struct.pack(">h", len(CHUNK_COLUMNS))
+        embedding_field_count = struct.pack(">h", len(EMBEDDING_COLUMNS))
+
+        for chunk, vector, index, chunk_id in zip(chunks, vectors, chunk_indexes, chunk_ids):
+            vector_field = encode_vector(vector)
+            chunk_text = encode_text(chunk.page_content)
+            self._chunks.write(b"".join((
+                chunk_field_count,
+                encode_int4(chunk_id),
+                encode_int4(db_document.id),
+                chunk_text,
+                encode_int4(index),
+                vector_field,
+                encode_text(json.dumps(chunk.metadata, default=str)),
+                encode_text(content_hash(chunk.page_content)),
+            )))
+            metadata = collection_metadata(chunk.metadata, chunk_id, index, db_document)
+            self._embeddings.write(b"".join((
+                embedding_field_count,
+                encode_uuid(str(uuid.uuid4())),
+                collection_field,
+                vector_field,
+                chunk_text,
+                self.encode_cmetadata(json.dumps(metadata, default=str)),
+                encode_text(str(chunk_id)),
+            )))
+
+        self.pending += len(chunks)
+        if self.pending >= self.flush_size:
+            self.flush()
+        return chunk_ids
+
+    def _copy(self, cursor, table: str, columns, rows: io.BytesIO) -> None:
+        payload = io.BytesIO(COPY_HEADER + rows.getvalue() + COPY_TRAILER)
+        cursor.copy_expert(copy_statement(table, columns), payload)
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        cursor = self.db.connection().connection.cursor()
+        try:
+            self._copy(cursor, "document_chunks", CHUNK_COLUMNS, self._chunks)
+            self._copy(cursor, EMBEDDING_TABLE, EMBEDDING_COLUMNS, self._embeddings)
+        finally:
+            cursor.close()
+        self.written += self.pending
+        self.pending = 0
+        self._chunks = io.BytesIO()
+        self._embeddings = io.BytesIO()
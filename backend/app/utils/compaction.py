@@ -0,0 +1,146 @@
+import time
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text, select, exists
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal, engine
+from .answer_cache import bump_collection_version
+from .vector_store import EMBEDDING_TABLE
+from ..models.document import Document
+from ..models.file_system import File as DBFile
+from ..models.ingestion_job import IngestionJob
+from ..config import settings
+
+# Only one compactor at a time, however many workers are idle
+COMPACTION_LOCK_KEY = "docchat:compaction"
+
+def tombstone_files(db: Session, file_ids: Iterable[int]) -> None:
+    """
+    Called after files are soft-deleted: retrieval already skips documents of
+    deleted files, this drops cached answers that may cite them. Takes effect
+    when the caller commits.
+    """
+    file_ids = list(file_ids)
+    if not file_ids:
+        return
+    collections = db.query(Document.collection).filter(
+        Document.file_id.in_(file_ids)
+    ).distinct().all()
+    for (collection_name,) in collections:
+        bump_collection_version(db, collection_name or settings.VECTOR_STORE_COLLECTION)
+
+def deleted_document_ids(db: Session, limit: int) -> List[int]:
+    """Documents whose file is soft-deleted, oldest first"""
+    return db.execute(
+        select(Document.id).where(
+            exists().where(DBFile.id == Document.file_id, DBFile.is_deleted == True)
+        ).order_by(Document.id).limit(limit)
+    ).scalars().all()
+
+def purge_chunk_batch(db: Session, document_ids: List[int], batch_size: int) -> dict:
+    """
+    Delete up to batch_size chunks of document_ids and their PGVector rows,
+    plus up to batch_size PGVector rows linked to the documents only through
+    cmetadata (written by PGVector itself, see schema_upgrade). Returns row
+    counts, the bytes the deleted rows occupied and whether nothing is left.
+    """
+    chunks = db.execute(
+        text(
+            "DELETE FROM document_chunks WHERE id IN ("
+            "SELECT id FROM document_chunks WHERE document_id = ANY(:document_ids) LIMIT :batch_size"
+            ") RETURNING id, pg_column_size(document_chunks.*)"
+        ),
+        {"document_ids": document_ids, "batch_size": batch_size}
+    ).all()
+    vectors = db.execute(
+        text(
+            f"DELETE FROM {EMBEDDING_TABLE} WHERE custom_id = ANY(:custom_ids) "
+            f"RETURNING pg_column_size({EMBEDDING_TABLE}.*)"
+        ),
+        {"custom_ids": [str(chunk_id) for chunk_id, _ in chunks]}
+    ).all() if chunks else []
+    linked = db.execute(
+        text(
+            f"DELETE FROM {EMBEDDING_TABLE} WHERE uuid IN ("
+            f"SELECT uuid FROM {EMBEDDING_TABLE} WHERE cmetadata->>'document_id' = ANY(:document_ids) "
+            f"LIMIT :batch_size) RETURNING pg_column_size({EMBEDDING_TABLE}.*)"
+        ),
+        {"document_ids": [str(document_id) for document_id in document_ids], "batch_size": batch_size}
+    ).all()
+    return {
+        "chunks": len(chunks),
+        "vectors": len(vectors) + len(linked),
+        "bytes": sum(size for _, size in chunks) + sum(size for (size,) in vectors) + sum(size for (size,) in linked),
+        "done": len(chunks) < batch_size and len(linked) < batch_size,
+    }
+
+def compact(
+    db: Optional[Session] = None,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> dict:
+    """
+    Physically remove chunks and vectors of soft-deleted files, batch_size
+    chunks per transaction so locks stay short. Document rows go once all of
+    their chunks and vectors are gone. Freed space is reusable by Postgres immediately
+    and returned to the OS by VACUUM FULL / pg_repack.
+
+    Returns what was purged; `bytes` is the size of the deleted rows.
+    """
+    batch_size = batch_size or settings.COMPACTION_BATCH_SIZE
+    report = {"documents": 0, "chunks": 0, "vectors": 0, "bytes": 0, "batches": 0}
+    started = time.perf_counter()
+
+    # Session-level advisory lock on a connection of its own, held for the whole run
+    with engine.connect() as lock_conn:
+        locked = lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": COMPACTION_LOCK_KEY}
+        ).scalar()
+        lock_conn.commit()
+        if not locked:
+            report["skipped"] = "another compaction is running"
+            return report
+
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            while max_batches is None or report["batches"] < max_batches:
+                document_ids = deleted_document_ids(db, batch_size)
+                if not document_ids:
+                    break
+
+                purged = purge_chunk_batch(db, document_ids, batch_size)
+                if purged["done"]:
+                    # Chunks and vectors of these documents are all gone; drop the documents too
+                    db.query(IngestionJob).filter(IngestionJob.document_id.in_(document_ids)).update(
+                        {IngestionJob.document_id: None}, synchronize_session=False
+                    )
+                    deleted = db.execute(
+                        text("DELETE FROM documents WHERE id = ANY(:document_ids) AND NOT EXISTS ("
+                             "SELECT 1 FROM document_chunks WHERE document_id = documents.id)"),
+                        {"document_ids": document_ids}
+                    )
+                    report["documents"] += deleted.rowcount
+                db.commit()
+
+                report["batches"] += 1
+                for key in ("chunks", "vectors", "bytes"):
+                    report[key] += purged[key]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if own_session:
+                db.close()
+            lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": COMPACTION_LOCK_KEY})
+            lock_conn.commit()
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+def vacuum_tables(bind=engine) -> None:
+    """VACUUM (ANALYZE) the tables compaction deletes from, so indexes and stats catch up"""
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in ("document_chunks", EMBEDDING_TABLE):
+            conn.execute(text(f"VACUUM (ANALYZE) {table}"))
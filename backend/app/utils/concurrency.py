@@ -0,0 +1,19 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from ..config import settings
+
+# Bounded pool for blocking calls (provider SDKs, CPU work) made from async handlers,
+# so they never run on the event loop and cannot grow without limit
+blocking_executor = ThreadPoolExecutor(max_workers=settings.BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+
+# Password hashing gets its own small pool: bcrypt is deliberately slow, and a
+# login burst should queue here rather than take every blocking_executor thread
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+
+async def run_blocking(func: Callable[..., Any], *args, executor: ThreadPoolExecutor = None, **kwargs) -> Any:
+    """Run func(*args, **kwargs) on a thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or blocking_executor, functools.partial(func, *args, **kwargs))
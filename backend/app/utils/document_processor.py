@@ -1,63 +1,135 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document as LangChainDocument  
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.vectorstores import PGVector
+import fitz
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, insert, update, func
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from collections import defaultdict, deque
 from ..models.document import Document, DocumentChunk
 from ..config import settings
-import numpy as np
 import os
 from docx import Document as DocxDocument
 from .embedding_base import EmbeddingProvider
+from .embedding_batch import BatchEmbedder
+from .vector_store import (
+    get_or_create_collection_id,
+    insert_collection_embeddings,
+    delete_collection_embeddings,
+    update_collection_metadata,
+    collection_metadata,
+)
+from .bulk_writer import ChunkCopyWriter
+from .embedding_cache import content_hash
+from .answer_cache import bump_collection_version
 from .embedding_gemini import GeminiEmbeddingProvider
 from .embedding_openai import OpenAIEmbeddingProvider
 from .embedding_huggingface import HuggingFaceEmbeddingProvider
 
-def extract_text_from_pdf(file_path: str) -> list:
-    """Extract text and metadata from PDF file"""
-    loader = PyMuPDFLoader(file_path)
-    documents = loader.load()
-    return documents
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx')
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Paragraphs / lines are grouped into units of about this many characters
+TEXT_UNIT_SIZE = CHUNK_SIZE * 8
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from Word document"""
+PDF_METADATA_KEYS = ("format", "title", "author", "subject", "keywords", "creator", "producer", "creationDate", "modDate", "trapped")
+
+def iter_pdf_pages(file_path: str) -> Iterator[LangChainDocument]:
+    """Yield one document per PDF page (same metadata as PyMuPDFLoader); only the current page is held in memory"""
+    with fitz.open(file_path) as pdf:
+        base_metadata = {"source": file_path, "file_path": file_path, "total_pages": pdf.page_count}
+        base_metadata.update({key: pdf.metadata.get(key, "") for key in PDF_METADATA_KEYS if pdf.metadata})
+        for page in pdf:
+            yield LangChainDocument(page_content=page.get_text(), metadata={**base_metadata, "page": page.number})
+
+def group_lines(lines: Iterable[str], unit_size: int = TEXT_UNIT_SIZE) -> Iterator[str]:
+    """Join consecutive lines into units of roughly unit_size characters"""
+    parts, length = [], 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= unit_size:
+            yield "".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield "".join(parts)
+
+def iter_docx_paragraphs(file_path: str) -> Iterator[str]:
+    """Paragraph texts, newline terminated. python-docx parses the XML up front, but no text copy is built."""
     doc = DocxDocument(file_path)
-    text = ""
     for paragraph in doc.paragraphs:
-        text += paragraph.text + "\n"
-    return text
+        yield paragraph.text + "\n"
 
-def get_text_content(file_path: str, file_name: str) -> list:
-    """Extract text content based on file type"""
+def iter_txt_lines(file_path: str) -> Iterator[str]:
+    with open(file_path, 'r', encoding='utf-8') as file:
+        yield from file
+
+def iter_text_units(file_path: str, file_name: str) -> Iterator[LangChainDocument]:
+    """
+    Extract text content based on file type, one unit at a time: a page for
+    PDFs, a group of paragraphs or lines for DOCX and TXT.
+    """
     file_ext = os.path.splitext(file_name)[1].lower()
-    
+
     if file_ext == '.pdf':
-        return extract_text_from_pdf(file_path)
-    elif file_ext == '.docx':
-        text = extract_text_from_docx(file_path)
-        return [LangChainDocument(page_content=text, metadata={"source": file_path, "filename": file_name})]
+        yield from iter_pdf_pages(file_path)
+        return
+    if file_ext == '.docx':
+        lines = iter_docx_paragraphs(file_path)
     elif file_ext == '.txt':
-        with open(file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-        return [LangChainDocument(page_content=text, metadata={"source": file_path, "filename": file_name})]
+        lines = iter_txt_lines(file_path)
     else:
         raise ValueError(f"Unsupported file type: {file_ext}")
+    for unit in group_lines(lines):
+        yield LangChainDocument(page_content=unit, metadata={"source": file_path, "filename": file_name})
+
+def count_text_units(file_path: str, file_name: str) -> Optional[int]:
+    """Page count for PDFs (read from the page tree, no text extraction); None otherwise"""
+    if os.path.splitext(file_name)[1].lower() != '.pdf':
+        return None
+    with fitz.open(file_path) as pdf:
+        return pdf.page_count
+
+def iter_document_chunks(
+    units: Iterable[LangChainDocument],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP
+) -> Iterator[LangChainDocument]:
+    """
+    Streaming splitter. Pages are split on their own, as split_documents
+    would. Other units are parts of one continuous text: the last, possibly
+    partial, chunk of a unit is carried into the next one, so chunk
+    boundaries match splitting the whole text while only one unit plus one
+    chunk is held at a time.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    carry: Optional[LangChainDocument] = None
+
+    for unit in units:
+        if 'page' in unit.metadata:
+            yield from text_splitter.split_documents([unit])
+            continue
+
+        text = unit.page_content
+        if carry is not None:
+            text = carry.page_content + "\n" + text
+        pieces = text_splitter.split_text(text)
+        if not pieces:
+            continue
+        for piece in pieces[:-1]:
+            yield LangChainDocument(page_content=piece, metadata=dict(unit.metadata))
+        carry = LangChainDocument(page_content=pieces[-1], metadata=dict(unit.metadata))
+
+    if carry is not None:
+        yield carry
+
+def get_text_content(file_path: str, file_name: str) -> list:
+    """Extract text content based on file type"""
+    return list(iter_text_units(file_path, file_name))
 
 def create_document_chunks(documents: list, file_path: str, file_name: str) -> list:
     """Create document chunks from text content"""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    
-    # For PDFs, we already have page-wise documents with metadata
-    if any('page' in doc.metadata for doc in documents):
-        return text_splitter.split_documents(documents)
-    
-    # For other file types, create chunks from the single document
-    return text_splitter.split_documents(documents)
+    return list(iter_document_chunks(documents))
 
 def get_embedding_provider():
     provider = os.getenv("EMBEDDING_PROVIDER", "gemini")
@@ -71,81 +143,324 @@ def get_embedding_provider():
 def initialize_embeddings() -> EmbeddingProvider:
     return get_embedding_provider()
 
-def create_document_record(file_name: str, file_path: str, user_id: int, db: Session) -> Document:
-    """Create and store document record in database"""
+def create_document_record(
+    file_name: str,
+    file_path: str,
+    user_id: int,
+    db: Session,
+    file_id: Optional[int] = None,
+    collection_name: Optional[str] = None
+) -> Document:
+    """
+    Add the document record and flush it for its id. Not committed: it
+    becomes visible with its chunks, so a failed ingestion leaves no row.
+    """
     db_document = Document(
         title=file_name,
         file_path=file_path,
-        uploaded_by=user_id
+        file_type=os.path.splitext(file_name)[1].lower(),
+        uploaded_by=user_id,
+        file_id=file_id,
+        collection=collection_name or settings.VECTOR_STORE_COLLECTION
     )
     db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
+    db.flush()
     return db_document
 
-def store_chunks_with_embeddings(
+def embed_chunks(
     chunks: list,
-    document_id: int,
     embeddings: EmbeddingProvider,
-    db: Session
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[List[float]]:
+    """Embed every chunk exactly once, in batches"""
+    embedder = BatchEmbedder(embeddings, progress_callback=progress_callback)
+    vectors = embedder.embed([chunk.page_content for chunk in chunks])
+    print(f"Embedded {len(chunks)} chunks: {embedder.summary()}")
+    if embeddings.cache is not None:
+        print(f"Embedding cache: {embeddings.cache.stats()}")
+    return vectors
+
+def write_chunks(
+    chunks: list,
+    vectors: List[List[float]],
+    db_document: Document,
+    db: Session,
+    collection_name: str,
+    start_index: int = 0,
+    chunk_indexes: Optional[List[int]] = None,
+    writer: Optional[ChunkCopyWriter] = None
 ) -> None:
-    """Store document chunks with their embeddings"""
-    for i, chunk in enumerate(chunks):
-        embedding_vector = embeddings.embed_query(chunk.page_content)
-        embedding_list = embedding_vector.tolist() if isinstance(embedding_vector, np.ndarray) else list(embedding_vector)
-        
-        db_chunk = DocumentChunk(
-            document_id=document_id,
-            chunk_text=chunk.page_content,
-            chunk_index=i,
-            embedding=embedding_list
-        )
-        db.add(db_chunk)
-    
+    """
+    Insert chunks with their precomputed embeddings into document_chunks and
+    the PGVector collection, numbering them from start_index (or with
+    chunk_indexes, if given). With a writer the rows are buffered for COPY
+    and reach the database on its next flush. Does not commit.
+    """
+    if chunk_indexes is None:
+        chunk_indexes = list(range(start_index, start_index + len(chunks)))
+    if writer is not None:
+        writer.add(db_document, chunks, vectors, chunk_indexes)
+        return
+    chunk_rows = [
+        {
+            "document_id": db_document.id,
+            "chunk_text": chunk.page_content,
+            "chunk_index": index,
+            "embedding": vector,
+            "chunk_metadata": chunk.metadata,
+            "content_hash": content_hash(chunk.page_content),
+        }
+        for chunk, vector, index in zip(chunks, vectors, chunk_indexes)
+    ]
+    chunk_ids = db.execute(
+        insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+        chunk_rows
+    ).scalars().all() if chunk_rows else []
+
+    store_in_pgvector(chunks, vectors, chunk_ids, db_document, db, collection_name, chunk_indexes)
+
+def open_chunk_writer(db: Session, collection_name: str) -> Optional[ChunkCopyWriter]:
+    """COPY writer when CHUNK_WRITER is 'copy', otherwise None (multi-row INSERT)"""
+    if settings.CHUNK_WRITER == "copy":
+        return ChunkCopyWriter(db, collection_name)
+    return None
+
+def store_chunks_with_embeddings(
+    chunks: list,
+    vectors: List[List[float]],
+    db_document: Document,
+    db: Session,
+    collection_name: str
+) -> None:
+    """
+    Store document chunks with their precomputed embeddings in document_chunks
+    and in the PGVector collection, committing both in one transaction
+    """
+    writer = open_chunk_writer(db, collection_name)
+    write_chunks(chunks, vectors, db_document, db, collection_name, writer=writer)
+    if writer is not None:
+        writer.flush()
+    bump_collection_version(db, collection_name)
     db.commit()
 
-def store_in_pgvector(chunks: list, embeddings: EmbeddingProvider, collection_name: str) -> None:
-    """Store documents in PGVector for similarity search"""
-  
-    PGVector.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        collection_name=settings.VECTOR_STORE_COLLECTION,
-        connection_string=settings.DATABASE_URL,
-        pre_delete_collection=False
+def store_in_pgvector(
+    chunks: list,
+    vectors: List[List[float]],
+    chunk_ids: List[int],
+    db_document: Document,
+    db: Session,
+    collection_name: str,
+    chunk_indexes: Optional[List[int]] = None
+) -> None:
+    """Store precomputed embeddings in the PGVector collection used for similarity search"""
+    if chunk_indexes is None:
+        chunk_indexes = list(range(len(chunks)))
+    metadatas = [
+        collection_metadata(chunk.metadata, chunk_id, index, db_document)
+        for chunk, chunk_id, index in zip(chunks, chunk_ids, chunk_indexes)
+    ]
+
+    collection_id = get_or_create_collection_id(db, collection_name)
+    insert_collection_embeddings(
+        db,
+        collection_id,
+        texts=[chunk.page_content for chunk in chunks],
+        vectors=vectors,
+        metadatas=metadatas,
+        custom_ids=[str(chunk_id) for chunk_id in chunk_ids]
     )
 
-async def process_document(file_path: str, file_name: str, user_id: int, db: Session):
+def iter_windows(items: Iterable, size: int) -> Iterator[list]:
+    window = []
+    for item in items:
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+async def process_document(
+    file_path: str,
+    file_name: str,
+    user_id: int,
+    db: Session,
+    file_id: Optional[int] = None,
+    progress_callback: Optional[Callable[[str, float], None]] = None,
+    collection_name: Optional[str] = None
+):
     """
     Process a document file (TXT, PDF, or DOCX):
-    1. Load and split the document into chunks
-    2. Create embeddings using Gemini API
-    3. Store document and chunks in PostgreSQL with vector embeddings
+    1. Stream pages / paragraphs through the splitter
+    2. Create embeddings using Gemini API, INGESTION_CHUNK_WINDOW chunks at a time
+    3. Store each window in PostgreSQL with vector embeddings
+
+    Only the current window of chunks is held in memory, whatever the size
+    of the document. Everything is committed in one transaction at the end.
+
+    progress_callback, if given, is called with (stage, progress) where
+    progress goes from 0.0 to 1.0.
     """
+    def report(stage: str, progress: float):
+        if progress_callback:
+            progress_callback(stage, progress)
+
+    collection_name = collection_name or settings.VECTOR_STORE_COLLECTION
+
     try:
-        # Extract text content with metadata
-        documents = get_text_content(file_path, file_name)
-        
-        # Create document chunks
-        chunks = create_document_chunks(documents, file_path, file_name)
+        report("parsing", 0.0)
+        total_units = count_text_units(file_path, file_name)
+        units_read = 0
+
+        def counted(units):
+            nonlocal units_read
+            for unit in units:
+                units_read += 1
+                yield unit
+
+        chunks = iter_document_chunks(counted(iter_text_units(file_path, file_name)))
         
         # Initialize embeddings
         embeddings = initialize_embeddings()
         
         # Create document record
-        db_document = create_document_record(file_name, file_path, user_id, db)
+        db_document = create_document_record(
+            file_name, file_path, user_id, db, file_id=file_id, collection_name=collection_name
+        )
         
         # Ensure pgvector extension is enabled
         db.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
         
-        # Store chunks with embeddings
-        store_chunks_with_embeddings(chunks, db_document.id, embeddings, db)
+        # Embed and store window by window, this takes the bulk of the time
+        report("embedding", 0.1)
+        writer = open_chunk_writer(db, collection_name)
+        stored = 0
+        for window in iter_windows(chunks, settings.INGESTION_CHUNK_WINDOW):
+            vectors = embed_chunks(window, embeddings)
+            write_chunks(window, vectors, db_document, db, collection_name, start_index=stored, writer=writer)
+            stored += len(window)
+            # Also the job heartbeat; without a page count progress stays put
+            done = units_read / total_units if total_units else 0.0
+            report("embedding", 0.1 + 0.8 * min(done, 1.0))
         
-        # Store in PGVector
-        store_in_pgvector(chunks, embeddings, settings.VECTOR_STORE_COLLECTION)
+        # Chunks and PGVector rows become visible together
+        report("storing", 0.9)
+        if writer is not None:
+            writer.flush()
+        bump_collection_version(db, collection_name)
+        db.commit()
         
+        report("done", 1.0)
         return db_document
         
     except Exception as e:
         db.rollback()
-        raise e 
\ No newline at end of file
+        raise e
+
+async def reindex_document(
+    db_document: Document,
+    file_path: str,
+    file_name: str,
+    db: Session,
+    progress_callback: Optional[Callable[[str, float], None]] = None
+) -> Document:
+    """
+    Re-index a changed file into its existing document by diffing chunks on
+    content hash:
+    - chunks whose text is unchanged keep their row and embedding (only
+      chunk_index / metadata are updated if they moved)
+    - new or changed chunks are embedded and inserted
+    - chunks that no longer occur are deleted from document_chunks and the
+      PGVector collection
+    Everything is committed in one transaction.
+    """
+    def report(stage: str, progress: float):
+        if progress_callback:
+            progress_callback(stage, progress)
+
+    collection_name = db_document.collection or settings.VECTOR_STORE_COLLECTION
+
+    try:
+        report("parsing", 0.0)
+        total_units = count_text_units(file_path, file_name)
+        units_read = 0
+
+        def counted(units):
+            nonlocal units_read
+            for unit in units:
+                units_read += 1
+                yield unit
+
+        # Existing chunks by hash; identical texts are matched in order
+        existing: Dict[str, deque] = defaultdict(deque)
+        for row in db.query(
+            DocumentChunk.id, DocumentChunk.content_hash, DocumentChunk.chunk_index, DocumentChunk.chunk_metadata
+        ).filter(DocumentChunk.document_id == db_document.id).order_by(DocumentChunk.chunk_index):
+            existing[row.content_hash].append(row)
+
+        embeddings = initialize_embeddings()
+        collection_id = get_or_create_collection_id(db, collection_name)
+        writer = open_chunk_writer(db, collection_name)
+        pending, pending_indexes = [], []
+        moved_rows, moved_metadata = [], {}
+        added = kept = 0
+
+        def flush():
+            nonlocal added
+            if pending:
+                vectors = embed_chunks(pending, embeddings)
+                write_chunks(
+                    pending, vectors, db_document, db, collection_name,
+                    chunk_indexes=list(pending_indexes), writer=writer
+                )
+                added += len(pending)
+                pending.clear()
+                pending_indexes.clear()
+            done = units_read / total_units if total_units else 0.0
+            report("embedding", 0.1 + 0.8 * min(done, 1.0))
+
+        report("embedding", 0.1)
+        chunks = iter_document_chunks(counted(iter_text_units(file_path, file_name)))
+        for index, chunk in enumerate(chunks):
+            matches = existing.get(content_hash(chunk.page_content))
+            if not matches:
+                pending.append(chunk)
+                pending_indexes.append(index)
+                if len(pending) >= settings.INGESTION_CHUNK_WINDOW:
+                    flush()
+                continue
+
+            row = matches.popleft()
+            kept += 1
+            if row.chunk_index != index or row.chunk_metadata != chunk.metadata:
+                moved_rows.append({"id": row.id, "chunk_index": index, "chunk_metadata": chunk.metadata})
+                moved_metadata[str(row.id)] = collection_metadata(chunk.metadata, row.id, index, db_document)
+        flush()
+
+        report("storing", 0.9)
+        if writer is not None:
+            writer.flush()
+        if moved_rows:
+            db.execute(update(DocumentChunk), moved_rows)
+            update_collection_metadata(db, collection_id, moved_metadata)
+
+        stale_ids = [row.id for rows in existing.values() for row in rows]
+        if stale_ids:
+            db.query(DocumentChunk).filter(DocumentChunk.id.in_(stale_ids)).delete(synchronize_session=False)
+            delete_collection_embeddings(db, collection_id, [str(chunk_id) for chunk_id in stale_ids])
+
+        db_document.file_path = file_path
+        db_document.updated_at = func.now()
+        bump_collection_version(db, collection_name)
+        db.commit()
+        print(
+            f"Re-indexed document {db_document.id}: {kept} kept ({len(moved_rows)} moved), "
+            f"{added} embedded, {len(stale_ids)} removed"
+        )
+
+        report("done", 1.0)
+        return db_document
+
+    except Exception as e:
+        db.rollback()
+        raise e
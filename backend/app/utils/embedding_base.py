@@ -1,8 +1,58 @@
-from typing import List
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache, embedding_cache, content_hash
+from ..config import settings
+
+def to_float_list(vector) -> List[float]:
+    return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
 
 class EmbeddingProvider:
+    """
+    Subclasses implement _embed_query/_embed_documents and describe themselves
+    with provider_name, model_name and task_type, which key the embedding cache.
+    """
+    provider_name: str = "base"
+    model_name: str = ""
+    task_type: str = "default"
+    query_task_type: Optional[str] = None  # Defaults to task_type
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        return embedding_cache if settings.EMBEDDING_CACHE_ENABLED else None
+
     def embed_query(self, text: str) -> List[float]:
-        raise NotImplementedError
+        task_type = self.query_task_type or self.task_type
+        # Questions repeat across API processes; let them share query embeddings
+        return self._cached([text], task_type, lambda texts: [self._embed_query(texts[0])], shared=True)[0]
 
     def embed_documents(self, texts: list) -> List[List[float]]:
-        raise NotImplementedError 
\ No newline at end of file
+        return self._cached(texts, self.task_type, self._embed_documents)
+
+    def _embed_query(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+    def _embed_documents(self, texts: list) -> List[List[float]]:
+        raise NotImplementedError
+
+    def _cached(self, texts: list, task_type: str, compute: Callable[[list], list], shared: bool = False) -> List[List[float]]:
+        """Serve texts from the cache, compute the rest once each and cache them"""
+        cache = self.cache
+        if cache is None:
+            return [to_float_list(vector) for vector in compute(texts)]
+
+        keys = [(self.provider_name, self.model_name, task_type, content_hash(text)) for text in texts]
+        found = cache.get_many(keys, shared=shared)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = compute(list(missing.values()))
+            computed = {key: to_float_list(vector) for key, vector in zip(missing.keys(), vectors)}
+            cache.put_many(computed, shared=shared)
+            found.update(computed)
+
+        return [found[key] for key in keys]
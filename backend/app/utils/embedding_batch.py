@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .embedding_base import EmbeddingProvider, to_float_list
+from ..config import settings
+
+RATE_LIMIT_MARKERS = ("429", "rate limit", "ratelimit", "resource exhausted", "quota", "too many requests")
+RATE_LIMIT_ERROR_NAMES = ("ResourceExhausted", "RateLimitError", "TooManyRequests")
+
+
+@dataclass
+class BatchStat:
+    start: int
+    size: int
+    latency: float
+    attempt: int
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Best-effort detection of provider rate limiting across Gemini/OpenAI/HF"""
+    if type(error).__name__ in RATE_LIMIT_ERROR_NAMES:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class BatchEmbedder:
+    """
+    Embed a list of texts through EmbeddingProvider.embed_documents:
+    1. Split the texts into provider-sized batches
+    2. Keep at most max_concurrency batches in flight
+    3. Halve the batch size on rate limiting and retry with backoff,
+       grow it back after a run of successful batches
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        min_batch_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_seconds: float = 1.0,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ):
+        self.provider = provider
+        self.max_batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.min_batch_size = max(1, min(min_batch_size or settings.EMBEDDING_MIN_BATCH_SIZE, self.max_batch_size))
+        self.max_concurrency = max(1, max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY)
+        self.max_retries = max_retries if max_retries is not None else settings.EMBEDDING_MAX_RETRIES
+        self.backoff_seconds = backoff_seconds
+        self.progress_callback = progress_callback
+        self.batch_size = self.max_batch_size
+        self.stats: List[BatchStat] = []
+        self._success_streak = 0
+        self._lock = threading.Lock()
+
+    def _shrink(self) -> None:
+        with self._lock:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            self._success_streak = 0
+
+    def _grow(self) -> None:
+        with self._lock:
+            self._success_streak += 1
+            if self._success_streak >= self.max_concurrency * 2 and self.batch_size < self.max_batch_size:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+                self._success_streak = 0
+
+    def _embed_batch(self, texts: List[str], delay: float):
+        if delay:
+            time.sleep(delay)
+        started = time.perf_counter()
+        vectors = self.provider.embed_documents(texts)
+        return [to_float_list(vector) for vector in vectors], time.perf_counter() - started
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Return one vector per text, in input order"""
+        total = len(texts)
+        results: List[Optional[List[float]]] = [None] * total
+        retries = deque()
+        cursor = 0
+        done_count = 0
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            while cursor < total or retries or in_flight:
+                while len(in_flight) < self.max_concurrency and (retries or cursor < total):
+                    if retries:
+                        start, end, attempt = retries.popleft()
+                        delay = self.backoff_seconds * (2 ** (attempt - 1))
+                    else:
+                        start, end, attempt = cursor, min(cursor + self.batch_size, total), 0
+                        cursor = end
+                        delay = 0
+                    future = pool.submit(self._embed_batch, texts[start:end], delay)
+                    in_flight[future] = (start, end, attempt)
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end, attempt = in_flight.pop(future)
+                    try:
+                        vectors, latency = future.result()
+                    except Exception as e:
+                        if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                            raise
+                        self._shrink()
+                        print(f"Embedding batch {start}-{end} rate limited, retrying with batch size {self.batch_size}")
+                        for sub_start in range(start, end, self.batch_size):
+                            retries.append((sub_start, min(sub_start + self.batch_size, end), attempt + 1))
+                        continue
+
+                    if len(vectors) != end - start:
+                        raise ValueError(f"Embedding provider returned {len(vectors)} vectors for {end - start} texts")
+                    results[start:end] = vectors
+                    self.stats.append(BatchStat(start=start, size=end - start, latency=latency, attempt=attempt))
+                    done_count += end - start
+                    self._grow()
+                    if self.progress_callback:
+                        self.progress_callback(done_count, total)
+
+        return results
+
+    def summary(self) -> dict:
+        """Per-batch latency report for the last embed() call(s)"""
+        latencies = sorted(stat.latency for stat in self.stats)
+        if not latencies:
+            return {"batches": 0}
+        return {
+            "batches": len(latencies),
+            "texts": sum(stat.size for stat in self.stats),
+            "retried_batches": sum(1 for stat in self.stats if stat.attempt > 0),
+            "final_batch_size": self.batch_size,
+            "latency_avg": sum(latencies) / len(latencies),
+            "latency_p50": latencies[len(latencies) // 2],
+            "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "latency_max": latencies[-1],
+        }
@@ -0,0 +1,180 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from .database import SessionLocal
+from ..models.embedding_cache import EmbeddingCacheEntry
+from ..config import settings
+
+# (provider, model, task_type, sha256(text))
+CacheKey = Tuple[str, str, str, str]
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def create_shared_backend(url: str):
+    """Redis client for QUERY_EMBEDDING_CACHE_URL (redis:// or rediss://), None if unset"""
+    if not url:
+        return None
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("QUERY_EMBEDDING_CACHE_URL points at Redis but the redis package is not installed")
+    return redis.Redis.from_url(url)
+
+def shared_key(key: CacheKey) -> str:
+    return "embedding:" + ":".join(key)
+
+class EmbeddingCache:
+    """
+    In-process LRU in front of the embedding_cache table. Lookups that ask
+    for it (query embeddings) also go through an optional shared Redis tier,
+    so API processes reuse each other's query embeddings without a DB read.
+    """
+
+    def __init__(self, max_entries: int, persistent: bool = True, shared_backend=None, shared_ttl: Optional[int] = None):
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self.shared_backend = shared_backend
+        self.shared_ttl = shared_ttl
+        self._entries: "OrderedDict[CacheKey, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: CacheKey, vector: List[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(EmbeddingCacheEntry).filter(
+                tuple_(
+                    EmbeddingCacheEntry.provider,
+                    EmbeddingCacheEntry.model,
+                    EmbeddingCacheEntry.task_type,
+                    EmbeddingCacheEntry.content_hash
+                ).in_(keys)
+            ).all()
+            return {(row.provider, row.model, row.task_type, row.content_hash): list(row.embedding) for row in rows}
+        finally:
+            db.close()
+
+    def _store(self, items: Dict[CacheKey, List[float]]) -> None:
+        db = SessionLocal()
+        try:
+            statement = insert(EmbeddingCacheEntry).values([
+                {"provider": provider, "model": model, "task_type": task_type, "content_hash": digest, "embedding": vector}
+                for (provider, model, task_type, digest), vector in items.items()
+            ]).on_conflict_do_nothing(constraint="uq_embedding_cache_key")
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+
+    def _load_shared(self, keys: List[CacheKey]) -> Dict[CacheKey, List[float]]:
+        try:
+            values = self.shared_backend.mget([shared_key(key) for key in keys])
+        except Exception as e:
+            print(f"Error reading shared embedding cache: {str(e)}")
+            return {}
+        return {
+            key: np.frombuffer(raw, dtype=np.float32).tolist()
+            for key, raw in zip(keys, values) if raw is not None
+        }
+
+    def _store_shared(self, items: Dict[CacheKey, List[float]]) -> None:
+        try:
+            pipeline = self.shared_backend.pipeline()
+            for key, vector in items.items():
+                pipeline.set(shared_key(key), np.asarray(vector, dtype=np.float32).tobytes(), ex=self.shared_ttl)
+            pipeline.execute()
+        except Exception as e:
+            print(f"Error writing shared embedding cache: {str(e)}")
+
+    def get_many(self, keys: Iterable[CacheKey], shared: bool = False) -> Dict[CacheKey, List[float]]:
+        found = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                else:
+                    missing.append(key)
+            self.memory_hits += len(found)
+
+        from_shared = {}
+        if missing and shared and self.shared_backend is not None:
+            from_shared = self._load_shared(missing)
+            found.update(from_shared)
+            missing = [key for key in missing if key not in from_shared]
+
+        loaded = {}
+        if missing and self.persistent:
+            try:
+                loaded = self._load(missing)
+            except Exception as e:
+                print(f"Error reading embedding cache: {str(e)}")
+        found.update(loaded)
+        if loaded and shared and self.shared_backend is not None:
+            self._store_shared(loaded)
+
+        with self._lock:
+            for key, vector in {**from_shared, **loaded}.items():
+                self._remember(key, vector)
+            self.shared_hits += len(from_shared)
+            self.db_hits += len(loaded)
+            self.misses += len(missing) - len(loaded)
+        return found
+
+    def put_many(self, items: Dict[CacheKey, List[float]], shared: bool = False) -> None:
+        if not items:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+        if shared and self.shared_backend is not None:
+            self._store_shared(items)
+        if self.persistent:
+            try:
+                self._store(items)
+            except Exception as e:
+                print(f"Error writing embedding cache: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.shared_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "shared_backend": type(self.shared_backend).__name__ if self.shared_backend is not None else None,
+                "memory_hits": self.memory_hits,
+                "shared_hits": self.shared_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+# Process-wide cache shared by every EmbeddingProvider
+embedding_cache = EmbeddingCache(
+    max_entries=settings.EMBEDDING_CACHE_SIZE,
+    persistent=settings.EMBEDDING_CACHE_PERSISTENT,
+    shared_backend=create_shared_backend(settings.QUERY_EMBEDDING_CACHE_URL),
+    shared_ttl=settings.QUERY_EMBEDDING_CACHE_TTL
+)
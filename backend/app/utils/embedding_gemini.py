@@ -3,16 +3,20 @@ from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from typing import List
 
 class GeminiEmbeddingProvider(EmbeddingProvider):
+    provider_name = "gemini"
+    model_name = "models/embedding-001"
+    task_type = "retrieval_document"
+
     def __init__(self, api_key):
         self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            task_type="retrieval_document",
+            model=self.model_name,
+            task_type=self.task_type,
             title="Document Embeddings",
             google_api_key=api_key
         )
 
-    def embed_query(self, text: str) -> List[float]:
+    def _embed_query(self, text: str) -> List[float]:
         return self.embeddings.embed_query(text)
 
-    def embed_documents(self, texts: list) -> List[List[float]]:
+    def _embed_documents(self, texts: list) -> List[List[float]]:
         return self.embeddings.embed_documents(texts) 
\ No newline at end of file
@@ -3,11 +3,14 @@ from langchain_openai import OpenAIEmbeddings
 from typing import List
 
 class OpenAIEmbeddingProvider(EmbeddingProvider):
+    provider_name = "openai"
+
     def __init__(self, api_key):
         self.embeddings = OpenAIEmbeddings(openai_api_key=api_key)
+        self.model_name = self.embeddings.model
 
-    def embed_query(self, text: str) -> List[float]:
+    def _embed_query(self, text: str) -> List[float]:
         return self.embeddings.embed_query(text)
 
-    def embed_documents(self, texts: list) -> List[List[float]]:
+    def _embed_documents(self, texts: list) -> List[List[float]]:
         return self.embeddings.embed_documents(texts) 
\ No newline at end of file
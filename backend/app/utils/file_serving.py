@@ -0,0 +1,172 @@
+import mimetypes
+import os
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .uploads import READ_SIZE, hash_file
+from .concurrency import run_blocking
+from ..models.file_system import File as DBFile
+from ..models.user import User
+from ..config import settings
+
+# Clients may keep a copy but must revalidate; If-None-Match makes that a 304
+CACHE_CONTROL = "private, no-cache"
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def readable_file(db: Session, file_id: int, user: User) -> DBFile:
+    """
+    A file the user may read: their own, any file for admins, and files
+    uploaded by admins when those are shared (as in retrieval), so every
+    citation a user is shown can be opened. 404 otherwise.
+    """
+    query = db.query(DBFile).filter(DBFile.id == file_id, DBFile.is_deleted == False)
+    if not user.is_admin:
+        if settings.RETRIEVAL_SHARE_ADMIN_DOCUMENTS:
+            query = query.filter(or_(
+                DBFile.created_by == user.id,
+                DBFile.created_by.in_(select(User.id).where(User.is_admin == True))
+            ))
+        else:
+            query = query.filter(DBFile.created_by == user.id)
+    file = query.first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not os.path.isfile(file.file_path):
+        raise HTTPException(status_code=404, detail="File content not found")
+    return file
+
+async def file_etag(db: Session, file: DBFile) -> str:
+    """Strong ETag from the content hash; hashed once and stored for older rows"""
+    if not file.content_hash:
+        file.content_hash = (await run_blocking(hash_file, file.file_path)).hexdigest()
+        db.commit()
+    return f'"{file.content_hash}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive for a single "bytes=" range, or None to send the
+    whole file (no header, a unit we don't know, or several ranges, which
+    RFC 9110 lets a server answer with 200). Raises RangeNotSatisfiable.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, _, last = spec.partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable(spec)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if end < start:
+        # Invalid rather than unsatisfiable: ignored, like a malformed header
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(spec)
+    return start, min(end, size - 1)
+
+def iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    """Plain generator; Starlette iterates it in its thread pool"""
+    remaining = end - start + 1
+    with open(path, "rb") as file:
+        file.seek(start)
+        while remaining > 0:
+            data = file.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+def content_disposition(name: str, download: bool) -> str:
+    kind = "attachment" if download else "inline"
+    fallback = name.encode("ascii", "ignore").decode().replace('"', "") or "download"
+    return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(name)}"
+
+def offload_headers(path: str) -> Optional[dict]:
+    """
+    Headers handing the body to the front proxy, or None to serve it here.
+    X-Accel-Redirect needs an internal nginx location mapping
+    FILE_SERVING_ACCEL_PREFIX to UPLOAD_DIR; the proxy then handles Range.
+    """
+    mode = settings.FILE_SERVING_OFFLOAD
+    if mode == "x-sendfile":
+        return {"X-Sendfile": os.path.abspath(path)}
+    if mode == "x-accel-redirect":
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(settings.UPLOAD_DIR))
+        if relative.startswith(".."):
+            return None
+        return {"X-Accel-Redirect": settings.FILE_SERVING_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative.replace(os.sep, "/"))}
+    return None
+
+async def serve_file(
+    db: Session,
+    file: DBFile,
+    range_header: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+    if_range: Optional[str] = None,
+    download: bool = False,
+    head: bool = False
+) -> Response:
+    etag = await file_etag(db, file)
+    size = os.path.getsize(file.file_path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(file.original_name or file.name, download),
+    }
+    media_type = file.file_type or mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    offloaded = offload_headers(file.file_path)
+    if offloaded and not head:
+        return Response(headers={**headers, **offloaded}, media_type=media_type)
+
+    # If-Range: only honour Range if the client's copy is still current
+    if if_range is not None and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if head:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        iter_file_range(file.file_path, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
@@ -0,0 +1,67 @@
+from typing import List, Tuple
+
+from sqlalchemy import select, literal, text
+from sqlalchemy.orm import Session
+
+from ..models.file_system import Folder
+
+def folder_subtree_cte(folder_id: int, name: str = "folder_subtree"):
+    """Recursive CTE of folder_id and all of its non-deleted descendants (column: id)"""
+    subtree = select(Folder.id).where(
+        Folder.id == folder_id,
+        Folder.is_deleted == False
+    ).cte(name=name, recursive=True)
+    children = select(Folder.id).where(
+        Folder.parent_id == subtree.c.id,
+        Folder.is_deleted == False
+    )
+    return subtree.union_all(children)
+
+def folder_ancestor_ids(db: Session, folder_id: int, owner_id: int) -> List[int]:
+    """
+    Ids from the top-level folder down to folder_id, in one recursive query.
+    Like walking parent_id by hand, the path stops at the first ancestor that
+    is deleted or belongs to someone else.
+    """
+    ancestors = select(
+        Folder.id, Folder.parent_id, literal(0).label("depth")
+    ).where(Folder.id == folder_id).cte(name="folder_ancestors", recursive=True)
+    parents = select(
+        Folder.id, Folder.parent_id, (ancestors.c.depth + 1).label("depth")
+    ).where(
+        Folder.id == ancestors.c.parent_id,
+        Folder.created_by == owner_id,
+        Folder.is_deleted == False
+    )
+    ancestors = ancestors.union_all(parents)
+    return db.execute(
+        select(ancestors.c.id).order_by(ancestors.c.depth.desc())
+    ).scalars().all()
+
+# Both UPDATEs read the same subtree snapshot, so the whole delete is one
+# statement and one round trip however deep or wide the folder is
+SOFT_DELETE_SUBTREE = text(
+    "WITH RECURSIVE subtree AS ("
+    "  SELECT id FROM folders WHERE id = :folder_id AND is_deleted = false"
+    "  UNION ALL"
+    "  SELECT f.id FROM folders f JOIN subtree s ON f.parent_id = s.id WHERE f.is_deleted = false"
+    "), deleted_folders AS ("
+    "  UPDATE folders SET is_deleted = true, updated_at = now()"
+    "  WHERE id IN (SELECT id FROM subtree) RETURNING id"
+    "), deleted_files AS ("
+    "  UPDATE files SET is_deleted = true, updated_at = now()"
+    "  WHERE folder_id IN (SELECT id FROM subtree) AND is_deleted = false RETURNING id"
+    ") "
+    "SELECT 'folder' AS kind, id FROM deleted_folders "
+    "UNION ALL SELECT 'file' AS kind, id FROM deleted_files"
+)
+
+def soft_delete_folder_tree(db: Session, folder_id: int) -> Tuple[List[int], List[int]]:
+    """
+    Soft-delete folder_id, its non-deleted subfolders and all of their files.
+    Returns (folder ids, file ids) that were deleted. Does not commit.
+    """
+    folder_ids, file_ids = [], []
+    for kind, item_id in db.execute(SOFT_DELETE_SUBTREE, {"folder_id": folder_id}):
+        (folder_ids if kind == "folder" else file_ids).append(item_id)
+    return folder_ids, file_ids
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import or_, and_, func, exists
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .compaction import compact
+from .uploads import expire_stale_uploads
+from .document_processor import process_document, reindex_document, SUPPORTED_EXTENSIONS
+from ..models.document import Document
+from ..models.ingestion_job import (
+    IngestionJob, JOB_PENDING, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED, MODE_INGEST, MODE_REINDEX
+)
+from ..models.file_system import File as DBFile
+from ..config import settings
+
+def is_ingestible(file_name: str) -> bool:
+    return os.path.splitext(file_name)[1].lower() in SUPPORTED_EXTENSIONS
+
+def enqueue_file(db: Session, file: DBFile, mode: str = MODE_INGEST) -> IngestionJob:
+    """Queue a parse -> chunk -> embed -> store job for a File row"""
+    job = IngestionJob(file_id=file.id, status=JOB_PENDING, stage="queued", progress=0.0, mode=mode)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_latest_job(db: Session, file_id: int) -> Optional[IngestionJob]:
+    return db.query(IngestionJob).filter(
+        IngestionJob.file_id == file_id
+    ).order_by(IngestionJob.id.desc()).first()
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[IngestionJob]:
+    """
+    Claim the oldest runnable job. Rows locked by other workers are skipped,
+    so any number of workers can poll the same table. Running jobs whose
+    worker stopped reporting progress are picked up again.
+
+    Jobs of one file run one at a time, in order: a job is not claimed while
+    an earlier job for the same file is unfinished, so an ingest and a
+    reindex never write the same file's chunks concurrently.
+    """
+    stale_before = func.now() - timedelta(seconds=settings.INGESTION_JOB_TIMEOUT)
+    earlier = aliased(IngestionJob)
+    earlier_unfinished = exists().where(
+        earlier.file_id == IngestionJob.file_id,
+        earlier.id < IngestionJob.id,
+        or_(
+            and_(earlier.status == JOB_PENDING, earlier.attempts < settings.INGESTION_MAX_ATTEMPTS),
+            # A running job blocks unless its worker is gone and it has no attempts left
+            and_(
+                earlier.status == JOB_RUNNING,
+                or_(earlier.updated_at >= stale_before, earlier.attempts < settings.INGESTION_MAX_ATTEMPTS)
+            )
+        )
+    )
+    job = db.query(IngestionJob).filter(
+        or_(
+            IngestionJob.status == JOB_PENDING,
+            and_(IngestionJob.status == JOB_RUNNING, IngestionJob.updated_at < stale_before)
+        ),
+        IngestionJob.attempts < settings.INGESTION_MAX_ATTEMPTS,
+        ~earlier_unfinished
+    ).order_by(IngestionJob.id).with_for_update(skip_locked=True).first()
+
+    if not job:
+        db.commit()
+        return None
+
+    job.status = JOB_RUNNING
+    job.stage = "claimed"
+    job.progress = 0.0
+    job.worker_id = worker_id
+    job.attempts += 1
+    job.error = None
+    job.started_at = func.now()
+    job.updated_at = func.now()
+    db.commit()
+    db.refresh(job)
+    return job
+
+def update_job_progress(db: Session, job_id: int, stage: str, progress: float) -> None:
+    """Record progress; also serves as the worker heartbeat"""
+    db.query(IngestionJob).filter(IngestionJob.id == job_id).update({
+        IngestionJob.stage: stage,
+        IngestionJob.progress: round(progress, 4),
+        IngestionJob.updated_at: func.now()
+    }, synchronize_session=False)
+    db.commit()
+
+def finish_job(db: Session, job: IngestionJob, error: Optional[str] = None, document_id: Optional[int] = None) -> None:
+    if error is None:
+        job.status = JOB_COMPLETED
+        job.stage = "done"
+        job.progress = 1.0
+        job.document_id = document_id
+        job.finished_at = func.now()
+    else:
+        # Leave the job pending for another attempt unless it has used them all
+        job.status = JOB_FAILED if job.attempts >= settings.INGESTION_MAX_ATTEMPTS else JOB_PENDING
+        job.stage = "failed" if job.status == JOB_FAILED else "queued"
+        job.error = error
+        if job.status == JOB_FAILED:
+            job.finished_at = func.now()
+    job.updated_at = func.now()
+    db.commit()
+
+def completed_document(db: Session, file_id: int) -> Optional[Document]:
+    """The document written by the file's last completed job, if it still exists"""
+    return db.query(Document).join(IngestionJob, IngestionJob.document_id == Document.id).filter(
+        IngestionJob.file_id == file_id,
+        IngestionJob.status == JOB_COMPLETED
+    ).order_by(IngestionJob.id.desc()).first()
+
+def run_job(job: IngestionJob, job_db: Session) -> None:
+    file = job_db.query(DBFile).filter(DBFile.id == job.file_id).first()
+    if not file or file.is_deleted:
+        job.attempts = settings.INGESTION_MAX_ATTEMPTS
+        finish_job(job_db, job, error="File was deleted before it could be processed")
+        return
+
+    work_db = SessionLocal()
+    progress_callback = lambda stage, progress: update_job_progress(job_db, job.id, stage, progress)
+    try:
+        existing = completed_document(work_db, file.id) if job.mode == MODE_REINDEX else None
+
+        if existing:
+            document = asyncio.run(reindex_document(
+                existing,
+                file_path=file.file_path,
+                file_name=file.name,
+                db=work_db,
+                progress_callback=progress_callback
+            ))
+        else:
+            document = asyncio.run(process_document(
+                file_path=file.file_path,
+                file_name=file.name,
+                user_id=file.created_by,
+                db=work_db,
+                file_id=file.id,
+                progress_callback=progress_callback
+            ))
+        finish_job(job_db, job, document_id=document.id)
+    except Exception as e:
+        print(f"Error processing ingestion job {job.id} for file {file.id}: {str(e)}")
+        job_db.rollback()
+        finish_job(job_db, job, error=str(e))
+    finally:
+        work_db.close()
+
+def run_next_job(worker_id: str) -> bool:
+    """Claim and run a single job. Returns False when the queue is empty."""
+    job_db = SessionLocal()
+    try:
+        job = claim_next_job(job_db, worker_id)
+        if not job:
+            return False
+        print(f"Worker {worker_id} processing job {job.id} (file {job.file_id}, attempt {job.attempts})")
+        run_job(job, job_db)
+        return True
+    finally:
+        job_db.close()
+
+def run_worker(worker_id: Optional[str] = None, poll_interval: Optional[float] = None, once: bool = False) -> None:
+    """
+    Worker process loop; start as many of these as needed. While the queue
+    is empty, one of the workers purges deleted files every COMPACTION_INTERVAL.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    poll_interval = poll_interval if poll_interval is not None else settings.INGESTION_POLL_INTERVAL
+    last_compaction = time.monotonic()
+    print(f"Ingestion worker {worker_id} started")
+    while True:
+        if run_next_job(worker_id):
+            continue
+        if once:
+            return
+        if settings.COMPACTION_INTERVAL and time.monotonic() - last_compaction >= settings.COMPACTION_INTERVAL:
+            last_compaction = time.monotonic()
+            try:
+                # A few batches at a time, so new jobs are not kept waiting
+                report = compact(max_batches=10)
+                if report.get("chunks"):
+                    print(f"Worker {worker_id} compacted deleted files: {report}")
+                cleanup_db = SessionLocal()
+                try:
+                    expired = expire_stale_uploads(cleanup_db)
+                finally:
+                    cleanup_db.close()
+                if expired:
+                    print(f"Worker {worker_id} discarded {expired} abandoned uploads")
+            except Exception as e:
+                print(f"Error compacting deleted files: {str(e)}")
+            continue
+        time.sleep(poll_interval)
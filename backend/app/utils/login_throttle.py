@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from ..config import settings
+
+class SlidingWindowLimiter:
+    """
+    At most max_attempts recorded events per key in any window of `window`
+    seconds. Keys are kept in LRU order and capped at max_keys so a spray of
+    distinct keys cannot grow memory without bound.
+    """
+
+    def __init__(self, max_attempts: int, window: float, max_keys: int = 100000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> Optional[deque]:
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def _wait(self, events: Optional[deque], now: float) -> Optional[float]:
+        if events is None or len(events) < self.max_attempts:
+            return None
+        return events[-self.max_attempts] + self.window - now
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """Seconds until key may try again, or None if it is under the limit"""
+        now = time.monotonic()
+        with self._lock:
+            return self._wait(self._prune(key, now), now)
+
+    def acquire(self, key: str) -> Optional[float]:
+        """
+        Check and count an attempt in one step, so concurrent attempts cannot
+        all pass the check before any is counted. Returns the wait if key is
+        over the limit (nothing is counted then), else None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            events = self._prune(key, now)
+            wait = self._wait(events, now)
+            if wait is not None:
+                return wait
+            if events is None:
+                events = self._events[key] = deque(maxlen=self.max_attempts)
+            events.append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+            return None
+
+    def release(self, key: str) -> None:
+        """Uncount one attempt of key, e.g. one that turned out to succeed"""
+        with self._lock:
+            events = self._events.get(key)
+            if events:
+                events.pop()
+                if not events:
+                    del self._events[key]
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+class LoginThrottle:
+    """
+    Login attempt limits per account and per client address. An attempt is
+    counted before the password is hashed and uncounted if it succeeds, so
+    only failures (and attempts still in flight) use up the limit, and a
+    throttled attempt costs no bcrypt time. State is per process; behind
+    several workers the effective limit is multiplied by the worker count.
+    """
+
+    def __init__(self, window: float, per_account: int, per_ip: int):
+        self.accounts = SlidingWindowLimiter(per_account, window)
+        self.addresses = SlidingWindowLimiter(per_ip, window)
+        self.throttled = 0
+
+    def attempt(self, account: str, address: Optional[str]) -> Optional[int]:
+        """Count a login attempt; returns Retry-After seconds if it must be refused"""
+        account = account.lower()
+        wait = self.accounts.acquire(account)
+        if wait is None and address:
+            wait = self.addresses.acquire(address)
+            if wait is not None:
+                self.accounts.release(account)
+        if wait is None:
+            return None
+        self.throttled += 1
+        return max(1, int(wait + 0.999))
+
+    def succeeded(self, account: str, address: Optional[str]) -> None:
+        self.accounts.reset(account.lower())
+        if address:
+            self.addresses.release(address)
+
+login_throttle = LoginThrottle(
+    settings.LOGIN_ATTEMPT_WINDOW,
+    settings.LOGIN_MAX_ATTEMPTS_PER_ACCOUNT,
+    settings.LOGIN_MAX_ATTEMPTS_PER_IP
+)
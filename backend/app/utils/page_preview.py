@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import fitz
+
+from .concurrency import run_blocking
+from ..config import settings
+
+FORMAT_MEDIA_TYPES = {"text": "application/json", "png": "image/png"}
+# Highlight lines shorter than this match too much of an unrelated page
+MIN_HIGHLIGHT_LINE = 4
+# Disk usage is re-measured every this many writes
+DISK_PRUNE_EVERY = 100
+
+class PageNotFound(Exception):
+    pass
+
+def highlight_lines(highlight_text: Optional[str]) -> List[str]:
+    if not highlight_text:
+        return []
+    return [line.strip() for line in highlight_text.splitlines() if len(line.strip()) >= MIN_HIGHLIGHT_LINE]
+
+def find_span(page_text: str, highlight_text: str) -> Optional[List[int]]:
+    """[start, end) of the chunk in the page text, by its first and last lines"""
+    lines = highlight_lines(highlight_text)
+    if not lines:
+        return None
+    start = page_text.find(lines[0])
+    if start < 0:
+        return None
+    last = page_text.find(lines[-1], start)
+    end = last + len(lines[-1]) if last >= 0 else start + len(lines[0])
+    return [start, end]
+
+def render_page(file_path: str, page_number: int, fmt: str, dpi: int, highlight_text: Optional[str] = None) -> bytes:
+    """
+    Runs in a render worker process. Page numbers are 0-based, as in the
+    "page" of citation metadata. Returns PNG bytes or, for fmt="text", JSON
+    with the page text and the highlighted span.
+    """
+    with fitz.open(file_path) as pdf:
+        if not 0 <= page_number < pdf.page_count:
+            raise PageNotFound(f"Page {page_number} is outside 0..{pdf.page_count - 1}")
+        page = pdf[page_number]
+        if fmt == "text":
+            text = page.get_text()
+            return json.dumps({
+                "page": page_number,
+                "page_count": pdf.page_count,
+                "text": text,
+                "highlight": find_span(text, highlight_text) if highlight_text else None,
+            }).encode("utf-8")
+
+        for line in highlight_lines(highlight_text):
+            quads = page.search_for(line, quads=True)
+            if quads:
+                page.add_highlight_annot(quads)
+        return page.get_pixmap(dpi=dpi, annots=True).tobytes("png")
+
+class PageCache:
+    """
+    Rendered pages keyed by file content hash, page, format, resolution and
+    highlight: a byte-bounded in-memory LRU in front of a byte-bounded disk
+    directory shared by all API processes. Keys never go stale, since new
+    content means a new hash; replaced files simply stop being asked for.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(content_hash: str, page_number: int, fmt: str, dpi: int, highlight_hash: Optional[str]) -> str:
+        resolution = "text" if fmt == "text" else f"{dpi}dpi"
+        return f"{content_hash}-p{page_number}-{resolution}-{highlight_hash or 'plain'}"
+
+    def _path(self, key: str) -> str:
+        # Two-level fan-out on the content hash keeps directories small
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+            return data
+
+    def get_disk(self, key: str) -> Optional[bytes]:
+        """Blocking; call through run_blocking"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)  # Recency for pruning
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Blocking; call through run_blocking"""
+        self._remember(key, data)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % DISK_PRUNE_EVERY == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self) -> int:
+        """Delete least recently used files until the directory is under 90% of disk_bytes"""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.disk_bytes:
+            return 0
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+                "max_memory_bytes": self.memory_bytes,
+                "max_disk_bytes": self.disk_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+page_cache = PageCache(settings.PAGE_CACHE_DIR, settings.PAGE_CACHE_MEMORY_BYTES, settings.PAGE_CACHE_DISK_BYTES)
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+# Renders in progress, so identical concurrent requests wait for one render
+_inflight: Dict[str, asyncio.Task] = {}
+
+def render_pool() -> ProcessPoolExecutor:
+    """Created on first use so API processes that never render pay nothing"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=settings.PAGE_RENDER_WORKERS)
+        return _render_pool
+
+def clamp_dpi(dpi: Optional[int]) -> int:
+    return max(36, min(dpi or settings.PAGE_RENDER_DEFAULT_DPI, settings.PAGE_RENDER_MAX_DPI))
+
+async def load_page(
+    key: str,
+    file_path: str,
+    page_number: int,
+    fmt: str,
+    dpi: int,
+    highlight_text: Optional[str]
+) -> bytes:
+    data = await run_blocking(page_cache.get_disk, key)
+    if data is None:
+        data = await run_blocking(
+            render_page, file_path, page_number, fmt, dpi, highlight_text, executor=render_pool()
+        )
+        await run_blocking(page_cache.put, key, data)
+    return data
+
+def _forget_inflight(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Every requester may have gone; don't report the exception as never retrieved
+    if not task.cancelled():
+        task.exception()
+
+async def get_page(
+    file_path: str,
+    content_hash: str,
+    page_number: int,
+    fmt: str,
+    dpi: int,
+    highlight_text: Optional[str] = None,
+    highlight_hash: Optional[str] = None
+) -> bytes:
+    """
+    Rendered page from the cache, rendering it in the worker pool on a miss.
+    The render runs as a task of its own that every request for the same key
+    awaits through a shield: a requester that disconnects only stops waiting,
+    the render still completes, fills the cache and answers the others.
+    """
+    key = PageCache.key(content_hash, page_number, fmt, dpi, highlight_hash)
+    data = page_cache.get_memory(key)
+    if data is not None:
+        return data
+
+    while True:
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load_page(key, file_path, page_number, fmt, dpi, highlight_text))
+            _inflight[key] = task
+            task.add_done_callback(lambda done, key=key: _forget_inflight(key, done))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                # The shared render itself was cancelled, not this request: retry
+                continue
+            raise
@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+
+from langchain.docstore.document import Document as LangChainDocument
+from sqlalchemy import select, text, func, cast
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+
+from .retrieval_filter import RetrievalFilter
+from .vector_store import DISTANCE_FUNCTIONS
+from ..models.document import Document, DocumentChunk
+from ..config import settings
+
+def chunk_distance(query_vector: List[float], distance_strategy: Optional[str] = None):
+    strategy = distance_strategy or settings.VECTOR_DISTANCE_STRATEGY
+    if strategy not in DISTANCE_FUNCTIONS:
+        raise ValueError(f"Unsupported distance strategy: {strategy}")
+    return getattr(DocumentChunk.embedding, DISTANCE_FUNCTIONS[strategy])(query_vector)
+
+def search_settings() -> list:
+    """Index scan parameters, applied to the current transaction only"""
+    statements = [
+        (text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(settings.HNSW_EF_SEARCH)}),
+        (text("SELECT set_config('ivfflat.probes', :value, true)"), {"value": str(settings.IVFFLAT_PROBES)}),
+    ]
+    if settings.VECTOR_ITERATIVE_SCAN != "off":
+        # Keep scanning the index until k rows pass the filter (pgvector >= 0.8)
+        for name in ("hnsw.iterative_scan", "ivfflat.iterative_scan"):
+            statements.append((text("SELECT set_config(:name, :value, true)"), {"name": name, "value": settings.VECTOR_ITERATIVE_SCAN}))
+    return statements
+
+def apply_search_settings(db: Session) -> None:
+    for statement, params in search_settings():
+        db.execute(statement, params)
+
+async def aapply_search_settings(db: AsyncSession) -> None:
+    for statement, params in search_settings():
+        await db.execute(statement, params)
+
+def chunk_to_document(
+    chunk: DocumentChunk,
+    document: Document,
+    distance: Optional[float] = None,
+    text_rank: Optional[float] = None
+) -> LangChainDocument:
+    metadata = dict(chunk.chunk_metadata or {})
+    metadata.setdefault("filename", document.title)
+    metadata.setdefault("source", document.file_path)
+    metadata.update({
+        "document_id": document.id,
+        "chunk_id": chunk.id,
+        "chunk_index": chunk.chunk_index,
+        "file_id": document.file_id,
+    })
+    if distance is not None:
+        metadata["distance"] = float(distance)
+    if text_rank is not None:
+        metadata["text_rank"] = float(text_rank)
+    return LangChainDocument(page_content=chunk.chunk_text, metadata=metadata)
+
+def chunk_search_statement(query_vector: List[float], k: int, retrieval_filter: Optional[RetrievalFilter] = None):
+    distance = chunk_distance(query_vector).label("distance")
+    statement = select(DocumentChunk, Document, distance).join(
+        Document, DocumentChunk.document_id == Document.id
+    ).options(defer(DocumentChunk.embedding))
+    if retrieval_filter is not None:
+        statement = statement.where(*retrieval_filter.document_conditions())
+    return statement.order_by(distance).limit(k)
+
+def search_document_chunks(
+    db: Session,
+    query_vector: List[float],
+    k: int = 3,
+    retrieval_filter: Optional[RetrievalFilter] = None
+) -> List[LangChainDocument]:
+    """Nearest-neighbour search over document_chunks.embedding using its vector index"""
+    apply_search_settings(db)
+    rows = db.execute(chunk_search_statement(query_vector, k, retrieval_filter)).all()
+    return [chunk_to_document(chunk, document, dist) for chunk, document, dist in rows]
+
+async def asearch_document_chunks(
+    db: AsyncSession,
+    query_vector: List[float],
+    k: int = 3,
+    retrieval_filter: Optional[RetrievalFilter] = None
+) -> List[LangChainDocument]:
+    """Async variant of search_document_chunks"""
+    await aapply_search_settings(db)
+    rows = (await db.execute(chunk_search_statement(query_vector, k, retrieval_filter))).all()
+    return [chunk_to_document(chunk, document, dist) for chunk, document, dist in rows]
+
+def full_text_search_statement(query: str, k: int, retrieval_filter: Optional[RetrievalFilter] = None):
+    tsquery = func.websearch_to_tsquery(cast(settings.FULL_TEXT_SEARCH_CONFIG, REGCONFIG), query)
+    rank = func.ts_rank_cd(DocumentChunk.chunk_tsv, tsquery).label("rank")
+    statement = select(DocumentChunk, Document, rank).join(
+        Document, DocumentChunk.document_id == Document.id
+    ).filter(
+        DocumentChunk.chunk_tsv.op("@@")(tsquery)
+    ).options(defer(DocumentChunk.embedding))
+    if retrieval_filter is not None:
+        statement = statement.where(*retrieval_filter.document_conditions())
+    return statement.order_by(rank.desc()).limit(k)
+
+def search_full_text(
+    db: Session,
+    query: str,
+    k: int = 3,
+    retrieval_filter: Optional[RetrievalFilter] = None
+) -> List[LangChainDocument]:
+    """Full-text search over document_chunks.chunk_tsv using its GIN index"""
+    rows = db.execute(full_text_search_statement(query, k, retrieval_filter)).all()
+    return [chunk_to_document(chunk, document, text_rank=rank) for chunk, document, rank in rows]
+
+async def asearch_full_text(
+    db: AsyncSession,
+    query: str,
+    k: int = 3,
+    retrieval_filter: Optional[RetrievalFilter] = None
+) -> List[LangChainDocument]:
+    """Async variant of search_full_text"""
+    rows = (await db.execute(full_text_search_statement(query, k, retrieval_filter))).all()
+    return [chunk_to_document(chunk, document, text_rank=rank) for chunk, document, rank in rows]
+
+def document_key(doc: LangChainDocument):
+    """Identify the same chunk across result lists from different sources"""
+    metadata = doc.metadata
+    if metadata.get("chunk_id") is not None:
+        return ("chunk", metadata["chunk_id"])
+    if metadata.get("document_id") is not None:
+        return ("document", metadata["document_id"], metadata.get("chunk_index"))
+    return ("content", doc.page_content)
+
+def reciprocal_rank_fusion(result_lists: List[List[LangChainDocument]], k: int, rrf_k: Optional[int] = None) -> List[LangChainDocument]:
+    """
+    Merge ranked lists: each document scores sum(1 / (rrf_k + rank)) over
+    the lists it appears in, and the top k by score are returned
+    """
+    rrf_k = rrf_k or settings.RRF_K
+    scores: Dict[tuple, float] = {}
+    documents: Dict[tuple, LangChainDocument] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            if key in documents:
+                documents[key].metadata.update({
+                    name: value for name, value in doc.metadata.items() if name not in documents[key].metadata
+                })
+            else:
+                documents[key] = doc
+
+    fused = []
+    for key in sorted(scores, key=scores.get, reverse=True)[:k]:
+        doc = documents[key]
+        doc.metadata["rrf_score"] = scores[key]
+        fused.append(doc)
+    return fused
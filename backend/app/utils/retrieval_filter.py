@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import select, or_, exists
+
+from .folder_tree import folder_subtree_cte
+from ..models.document import Document
+from ..models.file_system import File as DBFile
+from ..models.user import User
+
+@dataclass
+class RetrievalFilter:
+    """
+    Restricts retrieval candidates. The conditions are added to the WHERE
+    clause of the nearest-neighbour / full-text query itself, so the top k
+    are taken from documents in scope rather than filtered afterwards.
+    """
+    collection: Optional[str] = None
+    # Documents visible to viewer_id: their own plus, if share_admin_documents,
+    # everything uploaded by admins. None means no visibility restriction.
+    viewer_id: Optional[int] = None
+    share_admin_documents: bool = True
+    owner_id: Optional[int] = None
+    folder_id: Optional[int] = None  # Includes every subfolder
+    file_ids: Optional[List[int]] = None
+    # Skip documents whose file was soft-deleted but not yet compacted away
+    exclude_deleted: bool = True
+
+    def document_conditions(self) -> list:
+        conditions = []
+        if self.exclude_deleted:
+            conditions.append(~exists().where(DBFile.id == Document.file_id, DBFile.is_deleted == True))
+        if self.collection:
+            conditions.append(Document.collection == self.collection)
+        if self.viewer_id is not None:
+            if self.share_admin_documents:
+                conditions.append(or_(
+                    Document.uploaded_by == self.viewer_id,
+                    Document.uploaded_by.in_(select(User.id).where(User.is_admin == True))
+                ))
+            else:
+                conditions.append(Document.uploaded_by == self.viewer_id)
+        if self.owner_id is not None:
+            conditions.append(Document.uploaded_by == self.owner_id)
+        if self.file_ids:
+            conditions.append(Document.file_id.in_(self.file_ids))
+        if self.folder_id is not None:
+            subtree = folder_subtree_cte(self.folder_id)
+            conditions.append(Document.file_id.in_(
+                select(DBFile.id).where(DBFile.folder_id.in_(select(subtree.c.id)))
+            ))
+        return conditions
+
+    def document_ids(self):
+        """Subquery of the ids of documents in scope"""
+        return select(Document.id).where(*self.document_conditions())
+
+    def cache_key(self) -> str:
+        """Identifies the scope for caches keyed by what a query can see"""
+        parts = [self.collection or ""]
+        if self.viewer_id is not None:
+            parts.append(f"viewer:{self.viewer_id}:{int(self.share_admin_documents)}")
+        if self.owner_id is not None:
+            parts.append(f"owner:{self.owner_id}")
+        if self.folder_id is not None:
+            parts.append(f"folder:{self.folder_id}")
+        if self.file_ids:
+            parts.append("files:" + ",".join(str(file_id) for file_id in sorted(self.file_ids)))
+        return "|".join(parts)
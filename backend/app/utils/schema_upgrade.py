@@ -0,0 +1,92 @@
+from sqlalchemy import text
+from .database import engine
+from ..config import settings
+
+# Idempotent DDL for columns/indexes added after tables were first created.
+# Base.metadata.create_all only creates missing tables, so anything added to an
+# existing table must also be listed here.
+UPGRADE_STATEMENTS = [
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS file_id INTEGER REFERENCES files(id)",
+    "CREATE INDEX IF NOT EXISTS ix_documents_file_id ON documents (file_id)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS collection VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_documents_collection ON documents (collection)",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_metadata JSON",
+    # document_chunks.embedding used to be FLOAT[], which cannot be indexed for nearest-neighbour search
+    "DO $$ BEGIN "
+    "IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'document_chunks' "
+    "AND column_name = 'embedding' AND data_type = 'ARRAY') THEN "
+    f"ALTER TABLE document_chunks ALTER COLUMN embedding TYPE vector({settings.EMBEDDING_DIMENSION}) "
+    f"USING embedding::real[]::vector({settings.EMBEDDING_DIMENSION}); "
+    "END IF; END $$",
+    # PGVector collection tables, normally created lazily by langchain; chunks are
+    # written to them directly so they must exist before the first ingest
+    "CREATE TABLE IF NOT EXISTS langchain_pg_collection (name VARCHAR, cmetadata JSON, uuid UUID PRIMARY KEY)",
+    "CREATE TABLE IF NOT EXISTS langchain_pg_embedding ("
+    "collection_id UUID REFERENCES langchain_pg_collection (uuid) ON DELETE CASCADE, "
+    "embedding VECTOR, document VARCHAR, cmetadata JSON, custom_id VARCHAR, uuid UUID PRIMARY KEY)",
+    "CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_custom_id ON langchain_pg_embedding (custom_id)",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_tsv tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('{settings.FULL_TEXT_SEARCH_CONFIG}', coalesce(chunk_text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_chunk_tsv ON document_chunks USING gin (chunk_tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_chats_user_updated ON chats (user_id, updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_chat_created ON chat_messages (chat_id, created_at)",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_document_hash ON document_chunks (document_id, content_hash)",
+    "ALTER TABLE ingestion_jobs ADD COLUMN IF NOT EXISTS mode VARCHAR NOT NULL DEFAULT 'ingest'",
+    # Recursive folder queries follow parent_id down and folder_id across to files
+    "CREATE INDEX IF NOT EXISTS ix_folders_parent_id ON folders (parent_id)",
+    "CREATE INDEX IF NOT EXISTS ix_files_folder_id ON files (folder_id)",
+    "ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_files_content_hash ON files (content_hash)",
+    # Compaction purges PGVector rows that are linked to documents only by metadata
+    "CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_document_id "
+    "ON langchain_pg_embedding ((cmetadata->>'document_id'))",
+]
+
+# One-off data backfills for rows written before a column existed. They scan
+# whole tables, so they are not part of upgrade_schema (run on every API
+# start) but only of upgrade_db.py. Each must be safe to run again.
+BACKFILL_STATEMENTS = [
+    # Documents from before documents.file_id existed. Deletion, tombstones and
+    # reindexing find documents by file_id; match the uploader's own file at the
+    # same path (the earliest, since deduplicated uploads may share a path).
+    # Runs before the PGVector backfill below, which copies file_id.
+    "UPDATE documents AS d SET file_id = f.id FROM ("
+    "SELECT DISTINCT ON (file_path, created_by) id, file_path, created_by "
+    "FROM files ORDER BY file_path, created_by, id"
+    ") AS f "
+    "WHERE d.file_id IS NULL AND f.file_path = d.file_path AND f.created_by = d.uploaded_by",
+    f"UPDATE documents SET collection = '{settings.VECTOR_STORE_COLLECTION}' WHERE collection IS NULL",
+    "UPDATE document_chunks SET content_hash = encode(sha256(convert_to(coalesce(chunk_text, ''), 'UTF8')), 'hex') "
+    "WHERE content_hash IS NULL",
+    # Rows written by PGVector.from_documents carry no document_id, which retrieval
+    # scoping and tombstones rely on. Link them to the latest document of their
+    # collection with the same file path (loader metadata "source"); rows that
+    # match nothing stay unlinked and are never retrieved.
+    "UPDATE langchain_pg_embedding AS e "
+    "SET cmetadata = e.cmetadata::jsonb || jsonb_build_object('document_id', d.id, 'file_id', d.file_id) "
+    "FROM langchain_pg_collection AS c, ("
+    "SELECT DISTINCT ON (file_path, collection) id, file_id, file_path, collection "
+    "FROM documents ORDER BY file_path, collection, id DESC"
+    ") AS d "
+    "WHERE c.uuid = e.collection_id AND d.collection = c.name "
+    "AND d.file_path = e.cmetadata->>'source' AND e.cmetadata->>'document_id' IS NULL",
+]
+
+def upgrade_schema(bind=engine):
+    """Apply UPGRADE_STATEMENTS in a single transaction"""
+    with bind.begin() as conn:
+        for statement in UPGRADE_STATEMENTS:
+            conn.execute(text(statement))
+
+def backfill_data(bind=engine):
+    """Apply BACKFILL_STATEMENTS, each in a transaction of its own"""
+    for statement in BACKFILL_STATEMENTS:
+        with bind.begin() as conn:
+            conn.execute(text(statement))
+
+if __name__ == "__main__":
+    print("Upgrading database schema...")
+    upgrade_schema()
+    backfill_data()
+    print("Database schema is up to date!")
@@ -1,16 +1,24 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 
 from ..config import settings
 from ..models.user import User
-from ..utils.database import get_db
+from ..utils.database import SessionLocal
+from ..utils.user_cache import user_cache
+from ..utils.concurrency import run_blocking, password_executor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds makes hashes below the configured cost "need update", so they are
+# rehashed at the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -19,6 +27,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new hash if the stored one is below the configured cost)"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# Async variants for request handlers: bcrypt costs 100ms+ of CPU per call and
+# must not run on the event loop
+async def averify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await run_blocking(verify_and_update_password, plain_password, hashed_password, executor=password_executor)
+
+async def aget_password_hash(password: str) -> str:
+    return await run_blocking(get_password_hash, password, executor=password_executor)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -29,10 +49,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+def load_user(user_id: Optional[int], email: str) -> Optional[User]:
+    """User row detached from a short-lived session, safe to cache and share"""
+    db = SessionLocal()
+    try:
+        query = db.query(User)
+        user = query.filter(User.id == user_id).first() if user_id is not None else query.filter(User.email == email).first()
+        if user is not None:
+            db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+# Plain def so FastAPI runs a cache-miss lookup in its thread pool. Routes get a
+# detached User: column attributes only, relationships are not loaded.
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -41,12 +72,15 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
+        user_id: Optional[int] = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+
+    # Tokens issued before "uid" was added are still honoured, by email
+    key = f"id:{user_id}" if user_id is not None else f"email:{email}"
+    user = user_cache.get_or_load(key, lambda: load_user(user_id, email))
+    if user is None or user.email != email:
         raise credentials_exception
-    return user 
\ No newline at end of file
+    return user
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from datetime import timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .concurrency import run_blocking
+from .folder_tree import folder_ancestor_ids
+from ..models.file_system import File as DBFile
+from ..models.upload_session import UploadSession, UPLOAD_ACTIVE, UPLOAD_ABORTED
+from ..config import settings
+
+READ_SIZE = 1024 * 1024
+# Writes go to disk in blocks of about this size, off the event loop
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadBusy(Exception):
+    pass
+
+class HashingWriter:
+    """Appends to a file while updating a sha256 of everything written"""
+
+    def __init__(self, path: str, offset: int = 0, sha256=None):
+        self.path = path
+        self.offset = offset
+        self.sha256 = sha256 or hashlib.sha256()
+        self._file = open(path, "r+b" if offset else "wb")
+        self._file.seek(offset)
+        self._file.truncate()
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.sha256.update(data)
+        self.offset += len(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+def hash_file(path: str, length: Optional[int] = None):
+    """sha256 object over the first length bytes of path (all of it if None)"""
+    sha256 = hashlib.sha256()
+    remaining = length
+    with open(path, "rb") as file:
+        while remaining is None or remaining > 0:
+            data = file.read(READ_SIZE if remaining is None else min(READ_SIZE, remaining))
+            if not data:
+                break
+            sha256.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+    return sha256
+
+async def write_stream(
+    chunks: AsyncIterator[bytes],
+    writer: HashingWriter,
+    limit: int
+) -> int:
+    """
+    Copy chunks to writer until exhausted, raising UploadTooLarge as soon as
+    writer.offset would pass limit. Returns the number of bytes written.
+    """
+    start = writer.offset
+    buffer = bytearray()
+    async for chunk in chunks:
+        if writer.offset + len(buffer) + len(chunk) > limit:
+            raise UploadTooLarge(f"Upload exceeds the limit of {limit} bytes")
+        buffer += chunk
+        if len(buffer) >= WRITE_BUFFER_SIZE:
+            await run_blocking(writer.write, bytes(buffer))
+            buffer.clear()
+    if buffer:
+        await run_blocking(writer.write, bytes(buffer))
+    return writer.offset - start
+
+async def iter_upload_file(file, read_size: int = READ_SIZE) -> AsyncIterator[bytes]:
+    """Async iterator over a Starlette UploadFile"""
+    while True:
+        data = await file.read(read_size)
+        if not data:
+            return
+        yield data
+
+# Running hashes of active upload sessions, so each part only hashes its own
+# bytes. Another process (or a restart) rebuilds the hash from the partial file.
+_session_hashes: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+_busy_sessions = set()
+_session_hashes_lock = threading.Lock()
+
+def temp_upload_path(upload_id: Optional[str] = None) -> str:
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    return os.path.join(settings.UPLOAD_TEMP_DIR, upload_id or str(uuid.uuid4()))
+
+def session_writer(session: UploadSession) -> HashingWriter:
+    """
+    Writer positioned at the session's received_bytes. Parts of one session
+    must be sent one after another; a concurrent part in this process raises
+    UploadBusy. That is only a fast path: the caller must hold the session
+    row lock, which covers other processes. Call release_session when done.
+    """
+    with _session_hashes_lock:
+        if session.id in _busy_sessions:
+            raise UploadBusy("Another part of this upload is still being received")
+        _busy_sessions.add(session.id)
+        offset, sha256 = _session_hashes.pop(session.id, (None, None))
+    try:
+        if offset != session.received_bytes:
+            sha256 = hash_file(session.temp_path, session.received_bytes) if session.received_bytes else None
+        return HashingWriter(session.temp_path, offset=session.received_bytes, sha256=sha256)
+    except Exception:
+        with _session_hashes_lock:
+            _busy_sessions.discard(session.id)
+        raise
+
+def release_session(session: UploadSession, writer: HashingWriter, received_bytes: int) -> None:
+    """Keep the running hash if the part was accepted up to received_bytes"""
+    with _session_hashes_lock:
+        _busy_sessions.discard(session.id)
+        if writer.offset == received_bytes:
+            _session_hashes[session.id] = (writer.offset, writer.sha256.copy())
+
+def session_digest(session: UploadSession) -> str:
+    with _session_hashes_lock:
+        offset, sha256 = _session_hashes.pop(session.id, (None, None))
+    if offset != session.received_bytes:
+        sha256 = hash_file(session.temp_path, session.received_bytes)
+    return sha256.hexdigest()
+
+def forget_session(session: UploadSession) -> None:
+    with _session_hashes_lock:
+        _session_hashes.pop(session.id, None)
+    if os.path.exists(session.temp_path):
+        os.remove(session.temp_path)
+
+def upload_dir_for(db: Session, user_id: int, folder_id: Optional[int]) -> str:
+    """UPLOAD_DIR/<user id>/<ancestor folder ids...>, created if missing"""
+    parts = [str(ancestor_id) for ancestor_id in folder_ancestor_ids(db, folder_id, user_id)] if folder_id else []
+    upload_dir = os.path.join(settings.UPLOAD_DIR, str(user_id), *parts)
+    os.makedirs(upload_dir, exist_ok=True)
+    return upload_dir
+
+def find_stored_content(db: Session, content_hash: str, size: int) -> Optional[str]:
+    """Path of an existing file with identical content that is still on disk"""
+    candidates = db.query(DBFile.file_path).filter(
+        DBFile.content_hash == content_hash,
+        DBFile.size == size
+    ).order_by(DBFile.is_deleted, DBFile.id.desc()).limit(5).all()
+    for (file_path,) in candidates:
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+def is_path_in_use(db: Session, file_path: str, exclude_file_id: Optional[int] = None) -> bool:
+    query = db.query(DBFile.id).filter(DBFile.file_path == file_path)
+    if exclude_file_id is not None:
+        query = query.filter(DBFile.id != exclude_file_id)
+    return query.first() is not None
+
+def store_content(db: Session, temp_path: str, content_hash: str, size: int, target_path: str) -> str:
+    """
+    Move a fully received upload into place. Identical content that is
+    already stored is shared instead of written a second time, so a path may
+    back several File rows and must never be overwritten while referenced.
+    Returns the path the File row should point at.
+    """
+    existing_path = find_stored_content(db, content_hash, size)
+    if existing_path:
+        os.remove(temp_path)
+        return existing_path
+    if os.path.exists(target_path) and is_path_in_use(db, target_path):
+        stem, ext = os.path.splitext(target_path)
+        target_path = f"{stem}-{content_hash[:12]}{ext}"
+    shutil.move(temp_path, target_path)
+    return target_path
+
+def expire_stale_uploads(db: Session, max_age_seconds: Optional[int] = None) -> int:
+    """Abort uploads with no new part for max_age_seconds and delete their partial files"""
+    max_age_seconds = max_age_seconds or settings.UPLOAD_SESSION_TTL
+    stale = db.query(UploadSession).filter(
+        UploadSession.status == UPLOAD_ACTIVE,
+        UploadSession.updated_at < func.now() - timedelta(seconds=max_age_seconds)
+    ).all()
+    for session in stale:
+        forget_session(session)
+        session.status = UPLOAD_ABORTED
+    db.commit()
+    return len(stale)
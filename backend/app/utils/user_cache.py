@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from ..models.user import User
+from ..config import settings
+
+class UserCache:
+    """
+    Bounded LRU of detached User rows for get_current_user, keyed by the
+    token's user id (or email for tokens issued before the id was a claim).
+    Entries live for ttl seconds; invalidate() drops a user at once in this
+    process, the TTL bounds how long other processes may serve the old row.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a lookup that raced one is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: str, load: Callable[[], Optional[User]]) -> Optional[User]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self._entries.pop(key, None)
+            self.misses += 1
+            generation = self._generation
+
+        user = load()
+        if user is None:
+            return None
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (user, time.monotonic() + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget a user under every key it is cached by"""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (user, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
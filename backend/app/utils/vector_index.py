@@ -0,0 +1,73 @@
+import math
+from typing import Optional
+
+from sqlalchemy import text
+
+from .database import engine
+from ..config import settings
+
+INDEX_NAME = "ix_document_chunks_embedding"
+
+# VECTOR_DISTANCE_STRATEGY (langchain DistanceStrategy values) -> pgvector operator class
+OPERATOR_CLASSES = {
+    "cosine": "vector_cosine_ops",
+    "l2": "vector_l2_ops",
+    "euclidean": "vector_l2_ops",
+    "inner": "vector_ip_ops",
+    "max_inner_product": "vector_ip_ops",
+}
+
+def default_ivfflat_lists(row_count: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond"""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+def build_vector_index(
+    method: Optional[str] = None,
+    m: Optional[int] = None,
+    ef_construction: Optional[int] = None,
+    lists: Optional[int] = None,
+    distance_strategy: Optional[str] = None,
+    concurrently: bool = True,
+    replace: bool = False,
+    maintenance_work_mem: Optional[str] = None,
+    bind=engine
+) -> str:
+    """
+    Build an HNSW or IVFFlat index on document_chunks.embedding.
+    Returns the CREATE INDEX statement that was executed.
+    """
+    method = (method or settings.VECTOR_INDEX_METHOD).lower()
+    strategy = distance_strategy or settings.VECTOR_DISTANCE_STRATEGY
+    if strategy not in OPERATOR_CLASSES:
+        raise ValueError(f"Unsupported distance strategy: {strategy}")
+    opclass = OPERATOR_CLASSES[strategy]
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if method == "hnsw":
+            m = m or settings.HNSW_M
+            ef_construction = ef_construction or settings.HNSW_EF_CONSTRUCTION
+            options = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+        elif method == "ivfflat":
+            if not lists:
+                lists = settings.IVFFLAT_LISTS or default_ivfflat_lists(
+                    conn.execute(text("SELECT count(*) FROM document_chunks")).scalar()
+                )
+            options = f"lists = {int(lists)}"
+        else:
+            raise ValueError(f"Unsupported index method: {method}")
+
+        if maintenance_work_mem:
+            conn.execute(text("SELECT set_config('maintenance_work_mem', :value, false)"), {"value": maintenance_work_mem})
+        if replace:
+            conn.execute(text(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {INDEX_NAME}"))
+
+        statement = (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {INDEX_NAME} "
+            f"ON document_chunks USING {method} (embedding {opclass}) WITH ({options})"
+        )
+        conn.execute(text(statement))
+        conn.execute(text("ANALYZE document_chunks"))
+    return statement
@@ -0,0 +1,255 @@
+import json
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from langchain.docstore.document import Document as LangChainDocument
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import text, table, column, select, cast, Integer, String
+from sqlalchemy.dialects.postgresql import JSON, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .retrieval_filter import RetrievalFilter
+from ..config import settings
+
+# Tables managed by langchain_community.vectorstores.PGVector
+COLLECTION_TABLE = "langchain_pg_collection"
+EMBEDDING_TABLE = "langchain_pg_embedding"
+
+embedding_table = table(
+    EMBEDDING_TABLE,
+    column("uuid", UUID(as_uuid=False)),
+    column("collection_id", UUID(as_uuid=False)),
+    column("embedding", Vector()),
+    column("document", String),
+    column("cmetadata", JSON),
+    column("custom_id", String),
+)
+
+# VECTOR_DISTANCE_STRATEGY (langchain DistanceStrategy values) -> pgvector comparator (<=>, <->, <#>)
+DISTANCE_FUNCTIONS = {
+    "cosine": "cosine_distance",
+    "l2": "l2_distance",
+    "euclidean": "l2_distance",
+    "inner": "max_inner_product",
+    "max_inner_product": "max_inner_product",
+}
+
+def vector_literal(vector: List[float]) -> str:
+    """Format a vector the way pgvector parses it, e.g. '[0.1,0.2]'"""
+    return "[" + ",".join(str(float(value)) for value in vector) + "]"
+
+def get_or_create_collection_id(db: Session, collection_name: str) -> str:
+    """Look up the PGVector collection uuid, creating the collection if needed"""
+    # Serialise concurrent creators of the same collection for this transaction
+    db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": collection_name})
+    row = db.execute(
+        text(f"SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :name"),
+        {"name": collection_name}
+    ).first()
+    if row:
+        return str(row[0])
+
+    collection_id = str(uuid.uuid4())
+    db.execute(
+        text(f"INSERT INTO {COLLECTION_TABLE} (uuid, name, cmetadata) VALUES (:uuid, :name, NULL)"),
+        {"uuid": collection_id, "name": collection_name}
+    )
+    return collection_id
+
+def collection_metadata(chunk_metadata: dict, chunk_id: int, chunk_index: int, db_document) -> dict:
+    """cmetadata of a PGVector row; links it back to its document_chunks row"""
+    metadata = dict(chunk_metadata or {})
+    metadata.setdefault("filename", db_document.title)
+    metadata.update({
+        "document_id": db_document.id,
+        "chunk_id": chunk_id,
+        "chunk_index": chunk_index,
+        "file_id": db_document.file_id,
+    })
+    return metadata
+
+def insert_collection_embeddings(
+    db: Session,
+    collection_id: str,
+    texts: List[str],
+    vectors: List[List[float]],
+    metadatas: List[dict],
+    custom_ids: Optional[List[str]] = None
+) -> None:
+    """Insert precomputed embeddings into the PGVector collection without committing"""
+    if not texts:
+        return
+    custom_ids = custom_ids or [str(uuid.uuid4()) for _ in texts]
+    db.execute(
+        text(
+            f"INSERT INTO {EMBEDDING_TABLE} (uuid, collection_id, embedding, document, cmetadata, custom_id) "
+            "VALUES (:uuid, :collection_id, :embedding, :document, :cmetadata, :custom_id)"
+        ),
+        [
+            {
+                "uuid": str(uuid.uuid4()),
+                "collection_id": collection_id,
+                "embedding": vector_literal(vector),
+                "document": chunk_text,
+                "cmetadata": json.dumps(metadata, default=str),
+                "custom_id": custom_id,
+            }
+            for chunk_text, vector, metadata, custom_id in zip(texts, vectors, metadatas, custom_ids)
+        ]
+    )
+
+def delete_collection_embeddings(db: Session, collection_id: str, custom_ids: List[str]) -> int:
+    """Delete rows by custom_id (the document_chunks id) without committing"""
+    if not custom_ids:
+        return 0
+    result = db.execute(
+        embedding_table.delete().where(
+            embedding_table.c.collection_id == collection_id,
+            embedding_table.c.custom_id.in_(custom_ids)
+        )
+    )
+    return result.rowcount
+
+def update_collection_metadata(db: Session, collection_id: str, metadatas: Dict[str, dict]) -> None:
+    """Replace cmetadata of rows keyed by custom_id, without committing"""
+    if not metadatas:
+        return
+    db.execute(
+        text(
+            f"UPDATE {EMBEDDING_TABLE} SET cmetadata = :cmetadata "
+            "WHERE collection_id = CAST(:collection_id AS uuid) AND custom_id = :custom_id"
+        ),
+        [
+            {"collection_id": collection_id, "custom_id": custom_id, "cmetadata": json.dumps(metadata, default=str)}
+            for custom_id, metadata in metadatas.items()
+        ]
+    )
+
+class CollectionRetriever:
+    """
+    Similarity search over a PGVector collection. Unlike constructing a
+    langchain PGVector per request, this runs on the caller's session (and so
+    the shared engine pool) and looks the collection id up only once.
+    """
+
+    def __init__(self, collection_name: str, distance_strategy: Optional[str] = None):
+        strategy = distance_strategy or settings.VECTOR_DISTANCE_STRATEGY
+        if strategy not in DISTANCE_FUNCTIONS:
+            raise ValueError(f"Unsupported distance strategy: {strategy}")
+        self.collection_name = collection_name
+        self.distance_function = DISTANCE_FUNCTIONS[strategy]
+        self._collection_id: Optional[str] = None
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.total_search_seconds = 0.0
+
+    def _collection_lookup(self):
+        return text(f"SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :name"), {"name": self.collection_name}
+
+    def collection_id(self, db: Session) -> Optional[str]:
+        if self._collection_id is None:
+            row = db.execute(*self._collection_lookup()).first()
+            if row:
+                self._collection_id = str(row[0])
+        return self._collection_id
+
+    async def acollection_id(self, db: AsyncSession) -> Optional[str]:
+        if self._collection_id is None:
+            row = (await db.execute(*self._collection_lookup())).first()
+            if row:
+                self._collection_id = str(row[0])
+        return self._collection_id
+
+    def reset(self) -> None:
+        """Forget the cached collection id, e.g. after the collection was recreated"""
+        self._collection_id = None
+
+    def _search(self, collection_id: str, query_vector: List[float], k: int, retrieval_filter: Optional[RetrievalFilter]):
+        distance = getattr(embedding_table.c.embedding, self.distance_function)(query_vector).label("distance")
+        statement = select(embedding_table.c.document, embedding_table.c.cmetadata, distance).where(
+            embedding_table.c.collection_id == collection_id
+        )
+        if retrieval_filter is not None:
+            # Rows without a document_id (legacy, see schema_upgrade) are never in scope
+            document_id = cast(embedding_table.c.cmetadata["document_id"].astext, Integer)
+            statement = statement.where(document_id.in_(retrieval_filter.document_ids()))
+        return statement.order_by(distance).limit(k)
+
+    def _to_documents(self, rows, started: float) -> List[LangChainDocument]:
+        with self._lock:
+            self.searches += 1
+            self.total_search_seconds += time.perf_counter() - started
+
+        documents = []
+        for document, cmetadata, distance in rows:
+            # asyncpg hands json columns back as text
+            if isinstance(cmetadata, str):
+                cmetadata = json.loads(cmetadata)
+            metadata = dict(cmetadata or {})
+            metadata["distance"] = float(distance)
+            documents.append(LangChainDocument(page_content=document, metadata=metadata))
+        return documents
+
+    def similarity_search_by_vector(
+        self,
+        db: Session,
+        query_vector: List[float],
+        k: int = 3,
+        retrieval_filter: Optional[RetrievalFilter] = None
+    ) -> List[LangChainDocument]:
+        started = time.perf_counter()
+        collection_id = self.collection_id(db)
+        if collection_id is None:
+            return []
+        rows = db.execute(self._search(collection_id, query_vector, k, retrieval_filter)).all()
+        return self._to_documents(rows, started)
+
+    async def asimilarity_search_by_vector(
+        self,
+        db: AsyncSession,
+        query_vector: List[float],
+        k: int = 3,
+        retrieval_filter: Optional[RetrievalFilter] = None
+    ) -> List[LangChainDocument]:
+        started = time.perf_counter()
+        collection_id = await self.acollection_id(db)
+        if collection_id is None:
+            return []
+        rows = (await db.execute(self._search(collection_id, query_vector, k, retrieval_filter))).all()
+        return self._to_documents(rows, started)
+
+    def warm(self) -> None:
+        """Resolve the collection id and open a pooled connection ahead of the first request"""
+        db = SessionLocal()
+        try:
+            self.collection_id(db)
+        finally:
+            db.close()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "collection_name": self.collection_name,
+                "collection_id": self._collection_id,
+                "searches": self.searches,
+                "avg_search_ms": 1000 * self.total_search_seconds / self.searches if self.searches else 0.0,
+            }
+
+_retrievers: Dict[str, CollectionRetriever] = {}
+_retrievers_lock = threading.Lock()
+
+def get_collection_retriever(collection_name: Optional[str] = None) -> CollectionRetriever:
+    """Process-wide retriever per collection, created on first use"""
+    collection_name = collection_name or settings.VECTOR_STORE_COLLECTION
+    retriever = _retrievers.get(collection_name)
+    if retriever is None:
+        with _retrievers_lock:
+            retriever = _retrievers.setdefault(collection_name, CollectionRetriever(collection_name))
+    return retriever
+
+def retriever_metrics() -> List[dict]:
+    return [retriever.metrics() for retriever in list(_retrievers.values())]
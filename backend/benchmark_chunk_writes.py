@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.docstore.document import Document as LangChainDocument
+
+from app.models import user, file_system, document, chat, ingestion_job, embedding_cache, upload_session  # noqa: F401 - registers mappers
+from app.models.document import Document, DocumentChunk
+from app.utils.database import SessionLocal
+from app.utils.bulk_writer import ChunkCopyWriter
+from app.utils.document_processor import write_chunks, store_in_pgvector
+from app.config import settings
+
+BENCHMARK_COLLECTION = "chunk_write_benchmark"
+
+def make_chunks(count: int):
+    words = "pressure valve inspection schedule operator maintenance system seated energised interval".split()
+    chunks = [
+        LangChainDocument(
+            page_content=" ".join(random.choice(words) for _ in range(160)),
+            metadata={"source": "benchmark.pdf", "page": i // 4}
+        )
+        for i in range(count)
+    ]
+    vectors = [[random.uniform(-1, 1) for _ in range(settings.EMBEDDING_DIMENSION)] for _ in range(count)]
+    return chunks, vectors
+
+def write_orm(db, db_document, chunks, vectors) -> None:
+    """The original path: one ORM object per chunk, then the PGVector rows"""
+    rows = []
+    for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
+        row = DocumentChunk(
+            document_id=db_document.id,
+            chunk_text=chunk.page_content,
+            chunk_index=i,
+            embedding=vector,
+            chunk_metadata=chunk.metadata
+        )
+        db.add(row)
+        rows.append(row)
+    db.flush()
+    store_in_pgvector(chunks, vectors, [row.id for row in rows], db_document, db, BENCHMARK_COLLECTION)
+
+def write_insert(db, db_document, chunks, vectors) -> None:
+    """Multi-row INSERT ... RETURNING (CHUNK_WRITER=insert)"""
+    window = settings.INGESTION_CHUNK_WINDOW
+    for start in range(0, len(chunks), window):
+        write_chunks(chunks[start:start + window], vectors[start:start + window], db_document, db, BENCHMARK_COLLECTION, start_index=start)
+
+def write_copy(db, db_document, chunks, vectors, flush_size=None) -> None:
+    """Binary COPY (CHUNK_WRITER=copy)"""
+    writer = ChunkCopyWriter(db, BENCHMARK_COLLECTION, flush_size=flush_size)
+    window = settings.INGESTION_CHUNK_WINDOW
+    for start in range(0, len(chunks), window):
+        write_chunks(
+            chunks[start:start + window], vectors[start:start + window], db_document, db, BENCHMARK_COLLECTION,
+            start_index=start, writer=writer
+        )
+    writer.flush()
+
+WRITERS = {"orm": write_orm, "insert": write_insert, "copy": write_copy}
+
+def measure(method: str, chunks, vectors, flush_size=None) -> float:
+    """Time one write inside a transaction that is rolled back afterwards"""
+    db = SessionLocal()
+    try:
+        db_document = Document(title="benchmark", file_type=".pdf", collection=BENCHMARK_COLLECTION)
+        db.add(db_document)
+        db.flush()
+        started = time.perf_counter()
+        if method == "copy":
+            write_copy(db, db_document, chunks, vectors, flush_size)
+        else:
+            WRITERS[method](db, db_document, chunks, vectors)
+        db.flush()
+        return time.perf_counter() - started
+    finally:
+        db.rollback()
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare chunk + vector write paths (rolled back, nothing is kept)")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated chunk counts")
+    parser.add_argument("--methods", default="orm,insert,copy", help="Any of orm, insert, copy")
+    parser.add_argument("--flush-size", type=int, help="COPY flush size (default: CHUNK_COPY_FLUSH_SIZE)")
+    args = parser.parse_args()
+
+    for size in [int(value) for value in args.sizes.split(",")]:
+        chunks, vectors = make_chunks(size)
+        for method in args.methods.split(","):
+            seconds = measure(method, chunks, vectors, args.flush_size)
+            print(json.dumps({
+                "chunks": size,
+                "method": method,
+                "seconds": round(seconds, 2),
+                "chunks_per_second": round(size / seconds, 1),
+            }), flush=True)
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PARAGRAPH = (
+    "The operator shall verify that the pressure relief valve is seated before the "
+    "system is energised. Refer to the maintenance schedule for inspection intervals. "
+) * 4
+
+def make_pdf(path: str, pages: int) -> None:
+    import fitz
+    pdf = fitz.open()
+    for number in range(pages):
+        page = pdf.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), f"Page {number + 1}\n\n" + (PARAGRAPH + "\n\n") * 6, fontsize=9)
+    pdf.save(path)
+    pdf.close()
+
+def make_docx(path: str, paragraphs: int) -> None:
+    from docx import Document as DocxDocument
+    doc = DocxDocument()
+    for number in range(paragraphs):
+        doc.add_paragraph(f"{number + 1}. {PARAGRAPH}")
+    doc.save(path)
+
+def previous_extraction(file_path: str, file_name: str) -> int:
+    """What document_processor did before: load everything, then split"""
+    from langchain.docstore.document import Document as LangChainDocument
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyMuPDFLoader
+    from docx import Document as DocxDocument
+
+    if file_name.endswith(".pdf"):
+        documents = PyMuPDFLoader(file_path).load()
+    else:
+        text = ""
+        for paragraph in DocxDocument(file_path).paragraphs:
+            text += paragraph.text + "\n"
+        documents = [LangChainDocument(page_content=text, metadata={"source": file_path, "filename": file_name})]
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(documents)
+    return len(chunks)
+
+def streaming_extraction(file_path: str, file_name: str) -> int:
+    from app.utils.document_processor import iter_text_units, iter_document_chunks
+    return sum(1 for _ in iter_document_chunks(iter_text_units(file_path, file_name)))
+
+def measure(mode: str, file_path: str) -> dict:
+    """Runs in a fresh process so peak RSS belongs to this measurement alone"""
+    extract = previous_extraction if mode == "previous" else streaming_extraction
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = extract(file_path, os.path.basename(file_path))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mode": mode,
+        "chunks": chunks,
+        "seconds": round(elapsed, 2),
+        "python_peak_mb": round(peak / 2 ** 20, 1),
+        # ru_maxrss is in KB on Linux; includes allocations made by MuPDF itself
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare peak memory of whole-file and streaming text extraction")
+    parser.add_argument("files", nargs="*", help="PDF / DOCX files to measure (default: generated samples)")
+    parser.add_argument("--pages", type=int, default=1500, help="Pages in the generated PDF")
+    parser.add_argument("--paragraphs", type=int, default=60000, help="Paragraphs in the generated DOCX")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        files = args.files
+        if not files:
+            files = [os.path.join(workdir, "manual.pdf"), os.path.join(workdir, "manual.docx")]
+            print(f"Generating a {args.pages} page PDF and a {args.paragraphs} paragraph DOCX...", flush=True)
+            make_pdf(files[0], args.pages)
+            make_docx(files[1], args.paragraphs)
+
+        for file_path in files:
+            for mode in ("previous", "streaming"):
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    result = pool.submit(measure, mode, file_path).result()
+                result["file"] = os.path.basename(file_path)
+                result["size_mb"] = round(os.path.getsize(file_path) / 2 ** 20, 1)
+                print(json.dumps(result), flush=True)
@@ -0,0 +1,94 @@
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(latencies) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+    }
+
+def hash_cost(rounds: int, samples: int = 5) -> float:
+    """Seconds per bcrypt verify at the given cost, in this process"""
+    from passlib.context import CryptContext
+    context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+    hashed = context.hash("benchmark-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.verify("benchmark-password", hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def login_burst(base_url: str, email: str, password: str, logins: int, concurrency: int) -> dict:
+    """
+    Fire logins at /api/auth/token from `concurrency` threads while probing
+    GET / every 20ms. Probe latency shows how long the event loop stalls.
+    """
+    stop = threading.Event()
+    probes = []
+
+    def probe():
+        with requests.Session() as session:
+            while not stop.is_set():
+                started = time.perf_counter()
+                session.get(f"{base_url}/")
+                probes.append(time.perf_counter() - started)
+                time.sleep(0.02)
+
+    def login(_):
+        started = time.perf_counter()
+        response = requests.post(f"{base_url}/api/auth/token", data={"username": email, "password": password})
+        return response.status_code, time.perf_counter() - started
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+
+    statuses = {}
+    for status_code, _ in results:
+        statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "logins": logins,
+        "seconds": round(elapsed, 2),
+        "logins_per_second": round(logins / elapsed, 1),
+        "statuses": statuses,
+        "login": summarize([latency for _, latency in results]),
+        "probe": summarize(probes),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure login throughput and event loop stalls on a running API")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API")
+    parser.add_argument("--email", required=True, help="Existing account to log in as")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200, help="Logins per concurrency level")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels")
+    parser.add_argument("--rounds", type=int, help="Also report the local cost of one bcrypt verify at this cost")
+    args = parser.parse_args()
+
+    if args.rounds:
+        print(json.dumps({"bcrypt_rounds": args.rounds, "verify_ms": round(hash_cost(args.rounds) * 1000, 1)}), flush=True)
+
+    # Successful logins reset the per-account throttle, so a correct password
+    # measures hashing throughput rather than the 429 path
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        print(json.dumps(login_burst(args.url.rstrip("/"), args.email, args.password, args.logins, concurrency)), flush=True)
@@ -0,0 +1,32 @@
+import argparse
+import os
+import sys
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.vector_index import build_vector_index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the nearest-neighbour index on document_chunks.embedding")
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], help="Index type (default: VECTOR_INDEX_METHOD)")
+    parser.add_argument("--m", type=int, help="HNSW: max connections per layer (default: HNSW_M)")
+    parser.add_argument("--ef-construction", type=int, help="HNSW: candidate list size while building (default: HNSW_EF_CONSTRUCTION)")
+    parser.add_argument("--lists", type=int, help="IVFFlat: number of lists (default: IVFFLAT_LISTS or derived from row count)")
+    parser.add_argument("--distance", help="cosine, l2 or inner (default: VECTOR_DISTANCE_STRATEGY)")
+    parser.add_argument("--maintenance-work-mem", help="e.g. 2GB; speeds up HNSW builds on large tables")
+    parser.add_argument("--replace", action="store_true", help="Drop and rebuild an existing index")
+    parser.add_argument("--no-concurrently", action="store_true", help="Lock the table instead of building concurrently")
+    args = parser.parse_args()
+
+    statement = build_vector_index(
+        method=args.method,
+        m=args.m,
+        ef_construction=args.ef_construction,
+        lists=args.lists,
+        distance_strategy=args.distance,
+        concurrently=not args.no_concurrently,
+        replace=args.replace,
+        maintenance_work_mem=args.maintenance_work_mem
+    )
+    print(f"Vector index ready: {statement}")
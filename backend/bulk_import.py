@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+import sys
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.database import SessionLocal
+from app.utils.bulk_import import bulk_import
+from app.models.user import User
+from app.models import file_system, document, chat, ingestion_job, embedding_cache, upload_session  # noqa: F401 - registers mappers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a directory or tarball of documents")
+    parser.add_argument("source", help="Directory or .tar/.tar.gz archive")
+    parser.add_argument("--user-email", required=True, help="Owner of the imported files")
+    parser.add_argument("--folder-id", type=int, help="Folder to import into (default: top level)")
+    parser.add_argument("--collection", help="Vector store collection (default: VECTOR_STORE_COLLECTION)")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: BULK_IMPORT_WORKERS)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == args.user_email).first()
+        if not user:
+            sys.exit(f"No user with email {args.user_email}")
+
+        report = bulk_import(
+            args.source,
+            user.id,
+            db,
+            folder_id=args.folder_id,
+            collection_name=args.collection,
+            workers=args.workers,
+            progress_callback=lambda stats: print(
+                f"{stats['files']} files, {stats['pages_per_second']} pages/s, {stats['chunks_per_second']} chunks/s",
+                flush=True
+            )
+        )
+        print(json.dumps(report, indent=2))
+    finally:
+        db.close()
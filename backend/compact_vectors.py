@@ -0,0 +1,23 @@
+import argparse
+import json
+import os
+import sys
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import user, file_system, document, chat, ingestion_job, embedding_cache, upload_session  # noqa: F401 - registers mappers
+from app.utils.compaction import compact, vacuum_tables
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Purge chunks and vectors of deleted files")
+    parser.add_argument("--batch-size", type=int, help="Chunks deleted per transaction (default: COMPACTION_BATCH_SIZE)")
+    parser.add_argument("--max-batches", type=int, help="Stop after this many batches")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) the tables afterwards")
+    args = parser.parse_args()
+
+    report = compact(batch_size=args.batch_size, max_batches=args.max_batches)
+    print(json.dumps(report, indent=2))
+    if args.vacuum:
+        vacuum_tables()
+        print("Vacuumed document_chunks and langchain_pg_embedding")
@@ -0,0 +1,17 @@
+import argparse
+import os
+import sys
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.ingestion_queue import run_worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued document ingestion jobs")
+    parser.add_argument("--worker-id", help="Identifier recorded on claimed jobs (default: host:pid)")
+    parser.add_argument("--poll-interval", type=float, help="Seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+    args = parser.parse_args()
+
+    run_worker(worker_id=args.worker_id, poll_interval=args.poll_interval, once=args.once)
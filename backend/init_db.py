@@ -13,7 +13,10 @@ def init_db():
     # Create all tables
     from app.models.user import Base
     from app.models.document import Document, DocumentChunk
+    from app.models import file_system, chat, ingestion_job, embedding_cache, upload_session
+    from app.utils.schema_upgrade import upgrade_schema
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
 
     # Create admin user if it doesn't exist
     db = SessionLocal()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Add the parent directory to Python path so app module can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.database import engine, Base
+from app.models import user, file_system, document, chat, ingestion_job, embedding_cache, upload_session  # noqa: F401 - registers tables on Base
+from app.utils.schema_upgrade import upgrade_schema, backfill_data
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    backfill_data()
+    print("Database schema upgraded successfully!")